@@ -2,6 +2,23 @@
 function! nvimbols#init_config()
     call _nvimbols_init({
                 \   'nvimbols_window_name': g:nvimbols_window_name,
+                \   'nvimbols_max_symbols': g:nvimbols_max_symbols,
+                \   'nvimbols_max_memory': g:nvimbols_max_memory,
+                \   'nvimbols_update_delay': g:nvimbols_update_delay,
+                \   'nvimbols_update_max_wait': g:nvimbols_update_max_wait,
+                \   'nvimbols_cache_dir': g:nvimbols_cache_dir,
+                \   'nvimbols_prefetch': g:nvimbols_prefetch,
+                \   'nvimbols_prefetch_count': g:nvimbols_prefetch_count,
+                \   'nvimbols_prefetch_budget': g:nvimbols_prefetch_budget,
+                \   'nvimbols_tree_depth': g:nvimbols_tree_depth,
+                \   'nvimbols_tree_fanout': g:nvimbols_tree_fanout,
+                \   'nvimbols_stats': g:nvimbols_stats,
+                \   'nvimbols_stats_samples': g:nvimbols_stats_samples,
+                \   'nvimbols_log_file': g:nvimbols_log_file,
+                \   'nvimbols_log_level': g:nvimbols_log_level,
+                \   'nvimbols_log_max_size': g:nvimbols_log_max_size,
+                \   'nvimbols_log_backups': g:nvimbols_log_backups,
+                \   'cwd': getcwd(),
                 \   'rtp': &runtimepath
                 \ }, 
                 \ &filetype)
@@ -37,11 +54,59 @@ function! nvimbols#update_location()
     let s:LastLine = line
     let s:LastCol = col
 
-    call _nvimbols_update_location(filename, line, col)
+    call _nvimbols_update_location(filename, line, col, line('w0'), line('w$'))
 endfunction
 
-function! nvimbols#command(command) abort
-    call _nvimbols_command(a:command)
+function! nvimbols#track_changes() abort
+    let b:nvimbols_line_count = line('$')
+    let b:nvimbols_changedtick = b:changedtick
+endfunction
+
+function! nvimbols#file_changed() abort
+    if &buftype != '' || &filetype == 'nvimbols'
+        return
+    endif
+
+    if !exists('b:nvimbols_changedtick')
+        call nvimbols#track_changes()
+        return
+    endif
+
+    if b:changedtick == b:nvimbols_changedtick
+        return
+    endif
+
+    " Lines '[ to '] have been changed, line count changed by delta
+    let delta = line('$') - b:nvimbols_line_count
+    call nvimbols#track_changes()
+
+    call _nvimbols_file_changed(expand('%:p'), line("'["), line("']"), delta)
+endfunction
+
+function! nvimbols#file_written() abort
+    if &buftype != '' || &filetype == 'nvimbols'
+        return
+    endif
+
+    call _nvimbols_file_written(expand('%:p'))
+endfunction
+
+function! nvimbols#command(command, ...) abort
+    call call('_nvimbols_command', [a:command] + a:000)
+endfunction
+
+function! nvimbols#toggle_node() abort
+    if winnr() != nvimbols#window_number()
+        return
+    endif
+
+    let [line, col] = getpos('.')[1:2]
+    let result = nvimbols#get_link(line, col)
+    if result==""
+        return
+    endif
+
+    call nvimbols#command('toggle', result)
 endfunction
 
 function! nvimbols#set_jumps(jumps) abort
@@ -192,13 +257,25 @@ function! nvimbols#filetype() abort
 endfunction
 
 function! nvimbols#bufenter() abort
+    if !exists('b:nvimbols_changedtick')
+        call nvimbols#track_changes()
+    endif
     call nvimbols#update_location()
 endfunction
 
 function! nvimbols#insertleave() abort
+    call nvimbols#file_changed()
     call nvimbols#update_location()
 endfunction
 
+function! nvimbols#textchanged() abort
+    call nvimbols#file_changed()
+endfunction
+
+function! nvimbols#bufwritepost() abort
+    call nvimbols#file_written()
+endfunction
+
 function! nvimbols#cursormoved() abort
     call nvimbols#update_location()
 endfunction
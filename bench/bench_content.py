@@ -0,0 +1,62 @@
+"""
+Time to build and flatten Content for pages of many links, directly and through Base.render_file.
+
+    python3 bench/bench_content.py [links]
+"""
+import sys
+import time
+
+from fake import OutlineSource
+
+from nvimbols.content import Content, Wrapper, Highlight, Link
+from nvimbols.graph import SymbolsGraph
+from nvimbols.symbol import SymbolLocation, Symbol
+
+
+def build(links):
+    content = Content()
+    content += Wrapper("Symbol: ", Highlight('Statement', 'function'), "\n")
+    for i in range(links):
+        content += Link("bench.fake:%i:5:%i:6" % (i, i), Highlight('Type', "bench.fake:%i\n" % i))
+
+    content.raw()
+    list(content.highlights())
+    content.links()
+    return content
+
+
+def render_file(links):
+    """
+    Base.render_file (list mode) of a file with links symbols
+    """
+    source = OutlineSource()
+    graph = SymbolsGraph(source, None)
+    source.set_graph(graph)
+
+    wrappers = []
+    for line in range(1, links + 1):
+        wrapper = graph.create_wrapper(SymbolLocation('bench.fake', line, 5))
+        wrapper.symbol.set(Symbol('function_%i' % line, 'function'))
+        wrappers += [wrapper]
+
+    t = time.perf_counter()
+    content = source.render_file('bench.fake', wrappers)
+    content.raw()
+    list(content.highlights())
+    content.links()
+    content.fingerprint()
+    return time.perf_counter() - t
+
+
+def main():
+    sizes = [int(sys.argv[1])] if len(sys.argv) > 1 else [600, 10000]
+    for links in sizes:
+        t = time.perf_counter()
+        build(links)
+        built = time.perf_counter() - t
+
+        print("%6i links: Content %7.1fms, Base.render_file %7.1fms" % (links, built * 1e3, render_file(links) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
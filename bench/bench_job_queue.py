@@ -0,0 +1,72 @@
+"""
+Throughput of JobQueue and latency from _nvimbols_update_location to the rendered symbol.
+
+    python3 bench/bench_job_queue.py [cursor moves]
+"""
+import sys
+import time
+from threading import Event, Lock, active_count
+
+from fake import FakeSource, start_plugin, wait_idle
+
+from nvimbols.job_queue import JobQueue
+
+
+def jobs_per_second(tasks=4, count=20000):
+    queue = JobQueue(tasks)
+    lock = Lock()
+    done = Event()
+    finished = [0]
+
+    def job():
+        with lock:
+            finished[0] += 1
+            if finished[0] == count:
+                done.set()
+
+    t = time.perf_counter()
+    for _ in range(count):
+        queue.job(job)
+    done.wait()
+    return count / (time.perf_counter() - t)
+
+
+def update_to_render(moves):
+    """
+    Latencies in seconds from update_location until the symbol at the new location has been put into the buffer
+    """
+    source = FakeSource(delay=0.001)
+    plugin, vim = start_plugin(source)
+
+    latencies = []
+    for i in range(moves):
+        line = 1 + i * source.lines_per_symbol
+        name = 'function_%i' % line
+        puts = vim.puts
+
+        t = time.perf_counter()
+        plugin.update_location(['bench.fake', line, 1])
+        end = time.time() + 5
+        while time.time() < end:
+            content = plugin._content
+            if vim.puts > puts and content is not None and name in "\n".join(content.raw()):
+                break
+            time.sleep(0.0002)
+        latencies += [time.perf_counter() - t]
+
+    wait_idle(plugin)
+    return sorted(latencies)
+
+
+def main():
+    moves = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    print("JobQueue(4), 20k trivial jobs: %.0f jobs/s" % jobs_per_second())
+
+    latencies = update_to_render(moves)
+    print("update_location -> render, %i moves: p50 %.2fms, p99 %.2fms, %i threads alive" % (
+        moves, latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * .99)] * 1e3, active_count()))
+
+
+if __name__ == '__main__':
+    main()
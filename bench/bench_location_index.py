@@ -0,0 +1,105 @@
+"""
+Lookup time of LocationIndex as the number of wrappers grows.
+
+Wrappers are laid out like a source which extends wrapper.location over the whole symbol: every file consists of
+classes spanning several functions, each function spans several lines and contains single-line references.
+
+    python3 bench/bench_location_index.py [max wrappers]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rplugin', 'python3'))
+
+from nvimbols.symbol import SymbolLocation  # noqa: E402
+from nvimbols.location_index import LocationIndex  # noqa: E402
+
+
+FILES = 50
+FUNCTIONS_PER_CLASS = 10
+LINES_PER_FUNCTION = 8
+REFERENCES_PER_FUNCTION = 3
+
+
+class Wrapper:
+    def __init__(self, location):
+        self.location = location
+
+
+def build(n):
+    """
+    Index of n wrappers, half of them spanning multiple lines, and the list of all wrappers
+    """
+    index = LocationIndex()
+    wrappers = []
+    per_file = n // FILES
+
+    for f in range(FILES):
+        filename = '/project/src/file_%i.cpp' % f
+        line = 1
+        count = 0
+        while count < per_file:
+            """
+            A class, then its functions with their references
+            """
+            class_end = line + FUNCTIONS_PER_CLASS * LINES_PER_FUNCTION + 1
+            locations = [SymbolLocation(filename, line, 1, class_end, 2)]
+            for i in range(FUNCTIONS_PER_CLASS):
+                start = line + 1 + i * LINES_PER_FUNCTION
+                locations += [SymbolLocation(filename, start, 5, start + LINES_PER_FUNCTION - 1, 6)]
+                for j in range(REFERENCES_PER_FUNCTION):
+                    locations += [SymbolLocation(filename, start + 1 + j, 9, start + 1 + j, 15)]
+
+            for location in locations[:per_file - count]:
+                wrapper = Wrapper(location)
+                index.add(wrapper)
+                wrappers += [wrapper]
+            count += len(locations)
+            line = class_end + 1
+
+    return index, wrappers
+
+
+def lookups(wrappers, count, seed=0):
+    r = random.Random(seed)
+    result = []
+    for _ in range(count):
+        location = r.choice(wrappers).location
+        line = r.randint(location.start_line, max(location.start_line, location.end_line))
+        result += [SymbolLocation(location.filename, line, r.randint(1, 20))]
+    return result
+
+
+def measure(func, queries):
+    t = time.perf_counter()
+    for q in queries:
+        func(q)
+    return (time.perf_counter() - t) / len(queries) * 1e6
+
+
+def main():
+    max_wrappers = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    n = 1000
+    while n <= max_wrappers:
+        index, wrappers = build(n)
+        queries = lookups(wrappers, 5000)
+
+        """
+        Check against the linear scan LocationIndex replaces, on a few queries
+        """
+        for q in queries[:20]:
+            assert index.find_containing(q) is next((w for w in wrappers if w.location.contains(q)), None)
+
+        containing = measure(index.find_containing, queries)
+        overlapping = measure(index.find_overlapping, queries)
+        linear = measure(lambda q: next((w for w in wrappers if w.location.contains(q)), None), queries[:20])
+
+        print("%7i wrappers: find_containing %6.1fus, find_overlapping %6.1fus, linear scan %9.1fus" % (n, containing, overlapping, linear))
+        n *= 10
+
+
+if __name__ == '__main__':
+    main()
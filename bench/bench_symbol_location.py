@@ -0,0 +1,79 @@
+"""
+Memory and hashing cost of SymbolLocation for many locations, against the former implementation which kept a
+__dict__ and hashed (and compared) the formatted string.
+
+    python3 bench/bench_symbol_location.py [locations]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rplugin', 'python3'))
+
+from nvimbols.symbol import SymbolLocation  # noqa: E402
+
+
+FILES = 50
+LINES = 5000
+
+
+class StringHashedLocation:
+    """
+    SymbolLocation before __slots__ and field-wise hashing
+    """
+    def __init__(self, filename, start_line, start_col, end_line=None, end_col=None):
+        self.filename = filename
+        self.start_line = start_line
+        self.end_line = end_line if end_line is not None else start_line
+        self.start_col = start_col
+        self.end_col = end_col if end_col is not None else start_col + 1
+
+    def __str__(self):
+        return "%s:%i:%i:%i:%i" % (self.filename, self.start_line, self.start_col, self.end_line, self.end_col)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __eq__(self, other):
+        return hash(self) == hash(other)
+
+
+def measure(cls, count):
+    """
+    Seconds to create count locations (filenames built per location, like sources parsing them do), bytes per
+    location, seconds to build a set of them and to compare each against an equal copy
+    """
+    files = ['/home/user/project/src/module_%i/file_%i.cpp' % (i % 7, i) for i in range(FILES)]
+
+    tracemalloc.start()
+    t = time.perf_counter()
+    locations = [cls(''.join(files[i % FILES]), i % LINES, i % 80, i % LINES, i % 80 + 5) for i in range(count)]
+    created = time.perf_counter() - t
+    size = tracemalloc.get_traced_memory()[0] / count
+    tracemalloc.stop()
+
+    t = time.perf_counter()
+    unique = len(set(locations))
+    hashed = time.perf_counter() - t
+
+    copies = [cls(loc.filename, loc.start_line, loc.start_col, loc.end_line, loc.end_col) for loc in locations]
+    t = time.perf_counter()
+    equal = sum(1 for a, b in zip(locations, copies) if a == b)
+    compared = time.perf_counter() - t
+    assert equal == count
+
+    return created, size, hashed, unique, compared
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    for name, cls in (('string hashed', StringHashedLocation), ('SymbolLocation', SymbolLocation)):
+        created, size, hashed, unique, compared = measure(cls, count)
+        print("%14s, %i locations: create %.2fs, %4.0f bytes/location, set() %.2fs (%i unique), == %.2fs" % (
+            name, count, created, size, hashed, unique, compared))
+
+
+if __name__ == '__main__':
+    main()
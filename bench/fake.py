@@ -0,0 +1,170 @@
+"""
+Stand-ins for neovim and a language source, shared by the benchmarks and the stress test. Requires the neovim
+python client to be installed, as importing nvimbols does.
+"""
+import os
+import queue
+import random
+import sys
+import time
+from threading import Thread, Lock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rplugin', 'python3'))
+
+from nvimbols.source.base import Base  # noqa: E402
+from nvimbols.symbol import SymbolLocation, Symbol  # noqa: E402
+
+
+class FakeSession:
+    """
+    Runs threadsafe_call callbacks one after another on a single thread, like the neovim event loop
+    """
+    def __init__(self):
+        self._calls = queue.Queue()
+        Thread(target=lambda: self._loop(), daemon=True).start()
+
+    def _loop(self):
+        while True:
+            self._calls.get()()
+
+    def threadsafe_call(self, func):
+        self._calls.put(func)
+
+
+class FakeApi:
+    def __init__(self, vim):
+        self._vim = vim
+
+    def create_namespace(self, name):
+        return 1
+
+    def call_atomic(self, calls):
+        time.sleep(self._vim.put_delay)
+        self._vim.on_put()
+
+
+class FakeVim:
+    """
+    Records the number of buffer updates; put_delay is the time neovim takes for one
+    """
+    def __init__(self, put_delay=0.):
+        self.session = FakeSession()
+        self.api = FakeApi(self)
+        self.put_delay = put_delay
+
+        self._lock = Lock()
+        self.puts = 0
+        self.commands = []
+
+    def on_put(self):
+        with self._lock:
+            self.puts += 1
+
+    def call(self, name, *args):
+        """
+        Only bufnr, for the NVimbols window
+        """
+        return 1
+
+    def command(self, command):
+        with self._lock:
+            self.commands += [command]
+
+
+class FakeSource(Base):
+    """
+    Every file consists of functions of lines_per_symbol lines; the symbol at a location is the function around it.
+    Reference lists contain fanout locations spread over the file. Each load_* sleeps delay plus up to jitter seconds.
+    """
+    def __init__(self, delay=0., jitter=0., fanout=5, lines=5000, lines_per_symbol=10, tasks=4):
+        super().__init__(None)
+        self.name = 'fake'
+        self.filetypes = ['fake']
+        self.tasks = tasks
+
+        self.delay = delay
+        self.jitter = jitter
+        self.fanout = fanout
+        self.lines = lines
+        self.lines_per_symbol = lines_per_symbol
+
+        self._lock = Lock()
+        self.calls = {'symbol': 0, 'target': 0, 'source': 0, 'file': 0}
+
+    def _wait(self, type_):
+        with self._lock:
+            self.calls[type_] += 1
+        if self.delay > 0 or self.jitter > 0:
+            time.sleep(self.delay + random.random() * self.jitter)
+
+    def _start_line(self, line):
+        return (line - 1) // self.lines_per_symbol * self.lines_per_symbol + 1
+
+    def load_symbol(self, params):
+        self._wait('symbol')
+        wrapper = params['wrapper']
+        location = wrapper.location
+
+        start = self._start_line(location.start_line)
+        location.start_line = start
+        location.start_col = 1
+        location.end_line = start + self.lines_per_symbol - 1
+        location.end_col = 2
+        wrapper.symbol.set(Symbol('function_%i' % start, 'function'))
+
+    def _references(self, params, factor):
+        location = params['wrapper'].location
+        start = self._start_line(location.start_line)
+        return [self._graph.create_wrapper(SymbolLocation(location.filename, (start * factor + i * 37) % self.lines + 1, 5))
+                for i in range(self.fanout)]
+
+    def load_target_of(self, params):
+        self._wait('target')
+        params['wrapper'].target_of[params['reference'].name].set(self._references(params, 13))
+
+    def load_source_of(self, params):
+        self._wait('source')
+        params['wrapper'].source_of[params['reference'].name].set(self._references(params, 7))
+
+
+class OutlineSource(FakeSource):
+    """
+    FakeSource which also lists all symbols of a file, for the list mode
+    """
+    def load_file(self, filename):
+        self._wait('file')
+        return [(SymbolLocation(filename, start, 1, start + self.lines_per_symbol - 1, 2), Symbol('function_%i' % start, 'function'))
+                for start in range(1, self.lines + 1, self.lines_per_symbol)]
+
+
+def start_plugin(source, vim=None, **config):
+    """
+    NVimbolsPlugin running source, initialised like on opening a file. Returns (plugin, vim)
+    """
+    from nvimbols import NVimbolsPlugin
+
+    vim = vim if vim is not None else FakeVim()
+    plugin = NVimbolsPlugin(vim)
+    plugin._sources = {source.name: source}
+
+    options = {'rtp': '', 'nvimbols_window_name': 'nvimbols'}
+    options.update(config)
+    plugin.init([options, source.filetypes[0]])
+
+    end = time.time() + 5
+    while plugin._main is None and time.time() < end:
+        time.sleep(0.001)
+    return plugin, vim
+
+
+def wait_idle(plugin, timeout=10.):
+    """
+    Wait until all RPC calls have been handled and the graph has nothing left to load
+    """
+    end = time.time() + timeout
+    graph = plugin._main._graph
+    while time.time() < end:
+        if plugin._calls.empty() and graph._queue.is_done() and len(graph._in_flight) == 0:
+            return True
+        time.sleep(0.002)
+    return False
@@ -0,0 +1,126 @@
+"""
+Scenarios which once went wrong, each checked against the fake source. Fails (exit status 1) if any of them does.
+
+    python3 bench/regressions.py [scenario...]
+"""
+import sys
+import tempfile
+import time
+from threading import Event
+
+from fake import FakeSource, start_plugin, wait_idle
+
+from nvimbols.graph import SymbolsGraph
+from nvimbols.loadable import LOADABLE_FULL
+from nvimbols.symbol import SymbolLocation
+
+
+class BatchSource(FakeSource):
+    """
+    Loads reference lists in batches, recording (type, start lines) of every call
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loaded = []
+
+    def _record(self, type_, params_list):
+        self.loaded += [(type_, [params['wrapper'].location.start_line for params in params_list])]
+
+    def load_source_of(self, params):
+        self._record('source', [params])
+        super().load_source_of(params)
+
+    def load_target_of(self, params):
+        self._record('target', [params])
+        super().load_target_of(params)
+
+    def load_sources_of(self, params_list):
+        self._record('source', params_list)
+        for params in params_list:
+            super().load_source_of(params)
+
+    def load_targets_of(self, params_list):
+        self._record('target', params_list)
+        for params in params_list:
+            super().load_target_of(params)
+
+
+def wait_for(condition, timeout=5.):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.002)
+    return False
+
+
+def cold_cache():
+    """
+    First visit of a file with the cache enabled: the location is required once the cache has been read, and the
+    sidebar has to be rendered again then, reference lists included
+    """
+    source = FakeSource(delay=0.001)
+    plugin, vim = start_plugin(source, nvimbols_cache_dir=tempfile.mkdtemp(), nvimbols_update_delay=0)
+    plugin.update_location(['bench.fake', 15, 3])
+
+    def rendered():
+        content = plugin._content
+        raw = "\n".join(content.raw()) if content is not None else ""
+        return 'function_11' in raw and 'bench.fake:78' in raw
+
+    ok = wait_for(rendered)
+    wait_idle(plugin)
+    return ok
+
+
+def batch_after_epoch():
+    """
+    A request joining a batch queued before the location changed must not wait behind FULL loads of the current
+    epoch; the batch is moved to the current epoch along with it
+    """
+    source = BatchSource(tasks=1)
+    source.batch_window = 0.
+    graph = SymbolsGraph(source, None)
+    source.set_graph(graph)
+    name = graph.references[0].name
+
+    def wrapper(line):
+        wrapper = graph.create_wrapper(SymbolLocation('bench.fake', line, 5))
+        wrapper.symbol.set(None)
+        return wrapper
+
+    gate = Event()
+    graph._queue.job(lambda: gate.wait() and None)
+
+    wrapper(100).source_of[name].request(LOADABLE_FULL)
+    graph._epoch += 1
+    graph._queue.set_epoch(graph._epoch)
+    wrapper(200).source_of[name].request(LOADABLE_FULL)
+    wrapper(300).target_of[name].request(LOADABLE_FULL)
+
+    gate.set()
+    wait_for(lambda: graph._queue.is_done() and len(source.loaded) == 2)
+    return source.loaded == [('source', [100, 200]), ('target', [300])]
+
+
+SCENARIOS = {
+    'cold_cache': cold_cache,
+    'batch_after_epoch': batch_after_epoch
+}
+
+
+def main():
+    names = sys.argv[1:] or list(SCENARIOS)
+    failed = []
+    for name in names:
+        ok = SCENARIOS[name]()
+        print("%-20s %s" % (name, "ok" if ok else "FAILED"))
+        if not ok:
+            failed += [name]
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
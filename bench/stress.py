@@ -0,0 +1,167 @@
+"""
+Stress test: cursor moves, edits and mode switches from several threads against a source with random delays, while
+other threads request reference lists and render for Denite, with a small max_symbols so that wrappers are evicted
+all the time. Fails (exit status 1) on errors, loadables stuck loading, leftover requests or an index which does not
+match the wrappers kept.
+
+    python3 bench/stress.py [seconds] [max symbols]
+"""
+import random
+import sys
+import time
+from threading import Thread
+
+from fake import OutlineSource, start_plugin, wait_idle
+
+from nvimbols.logger import LOGGER, LOG_INFO, LOG_ERROR
+
+
+FILENAME = 'bench.fake'
+
+"""
+RPC calls and requests are only made while fewer calls or jobs than this are waiting, so the load stays bounded by
+what the plugin and the source manage to do
+"""
+MAX_BACKLOG = 200
+
+
+class Errors:
+    """
+    Everything reported through on_error ends up in the log
+    """
+    def __init__(self):
+        self.messages = []
+        self._log = LOGGER.log
+        LOGGER.log = self.log
+
+    def log(self, msg, level=LOG_INFO):
+        if level == LOG_ERROR:
+            self.messages += [msg]
+        self._log(msg, level)
+
+
+def move(plugin, lines, seed, stop, latencies, calls):
+    r = random.Random(seed)
+    while not stop[0]:
+        if plugin._calls.qsize() > MAX_BACKLOG:
+            time.sleep(0.005)
+            continue
+
+        line = r.randint(1, lines)
+        t = time.perf_counter()
+        plugin.update_location([FILENAME, line, r.randint(1, 20)])
+        latencies += [time.perf_counter() - t]
+        calls[0] += 1
+
+        if r.random() < 0.02:
+            plugin.file_changed([FILENAME, line, line + 2, r.choice([-1, 0, 1])])
+            calls[0] += 1
+        if r.random() < 0.01:
+            plugin.command(['switch_mode'])
+            calls[0] += 1
+        time.sleep(r.random() * 0.001)
+
+
+def queue_totals(graph):
+    """
+    Jobs waiting and jobs dispatched so far
+    """
+    stats = graph.queue_stats().values()
+    return sum(s['queued'] for s in stats), sum(s['dispatched'] for s in stats)
+
+
+def request(graph, lines, seed, stop):
+    r = random.Random(seed)
+    while not stop[0]:
+        if queue_totals(graph)[0] > MAX_BACKLOG:
+            time.sleep(0.005)
+            continue
+
+        wrappers = graph.in_lines(FILENAME, 1, lines)
+        if len(wrappers) > 0:
+            for loadable in r.choice(wrappers).loadables(create=True):
+                loadable.request()
+        time.sleep(0.0005)
+
+
+def render_denite(main, seed, stop, renders):
+    r = random.Random(seed)
+    while not stop[0]:
+        content = main.render_denite(r.choice(['symbol', 'symbol', 'list']))
+        content.get_candidates()
+        renders[0] += 1
+        if r.random() < 0.05:
+            main.close_denite()
+        time.sleep(r.random() * 0.002)
+
+
+def stuck_loadables(graph):
+    with graph._lock:
+        wrappers = list(graph._lru.values())
+    return [(str(w.location), loadable.params()['type']) for w in wrappers for loadable in w.loadables()
+            if loadable.is_loading()]
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.
+    max_symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+    errors = Errors()
+    source = OutlineSource(jitter=0.004, fanout=8, tasks=8)
+    plugin, vim = start_plugin(source, nvimbols_update_delay=0, nvimbols_prefetch='visible', nvimbols_max_symbols=max_symbols)
+    main = plugin._main
+    graph = main._graph
+
+    stop = [False]
+    latencies = []
+    renders = [0]
+    calls = [0]
+    threads = [Thread(target=move, args=(plugin, source.lines, i, stop, latencies, calls)) for i in range(6)]
+    threads += [Thread(target=request, args=(graph, source.lines, 100 + i, stop)) for i in range(2)]
+    threads += [Thread(target=render_denite, args=(main, 200 + i, stop, renders)) for i in range(2)]
+
+    started = time.time()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop[0] = True
+    for t in threads:
+        t.join()
+
+    """
+    Allow three times the time the backlogs take at the rates calls and jobs have been handled so far. Requests
+    made by the last renders are queued with a delay, so only the second wait counts.
+    """
+    elapsed = time.time() - started
+    backlog, dispatched = queue_totals(graph)
+    waiting = plugin._calls.qsize()
+    timeout = 5. + 3. * elapsed * (backlog / max(dispatched, 1) + waiting / max(calls[0] - waiting, 1))
+    wait_idle(plugin, timeout)
+    time.sleep(0.3)
+    idle = wait_idle(plugin, timeout)
+
+    stuck = stuck_loadables(graph)
+    with graph._lock:
+        indexed = set(id(w) for w in graph._data)
+        consistent = indexed == set(graph._lru.keys())
+        shared, pending, batches = len(graph._shared), len(graph._pending), len(graph._batches)
+
+    latencies.sort()
+    print("update_location: %i calls, p50 %.0fus, p99 %.0fus" % (
+        len(latencies), latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * .99)] * 1e6))
+    print("denite renders %i, source calls %s, evicted %s" % (renders[0], source.calls, graph.eviction_stats))
+    print("backlog on stop %i jobs, %i calls, timeout %.1fs" % (backlog, waiting, timeout))
+    print("idle %s, errors %i, stuck loadables %i, shared %i, pending %i, batches %i, index consistent %s (%i wrappers)" % (
+        idle, len(errors.messages), len(stuck), shared, pending, batches, consistent, len(indexed)))
+
+    for message in errors.messages[:3]:
+        print(message)
+    for location, type_ in stuck[:5]:
+        print("stuck: %s %s" % (location, type_))
+
+    if not idle or errors.messages or stuck or shared or pending or batches or not consistent:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,3 +2,7 @@ nnoremap <buffer> <silent> f :NVimbolsFollow<CR>
 nnoremap <buffer> <silent> v :NVimbolsFollowVertical<CR>
 nnoremap <buffer> <silent> ? :NVimbolsHelp<CR>
 nnoremap <buffer> <silent> o :NVimbolsSwitch<CR>
+nnoremap <buffer> <silent> m :NVimbolsMore<CR>
+nnoremap <buffer> <silent> t :NVimbolsTree<CR>
+nnoremap <buffer> <silent> r :NVimbolsTreeRelation<CR>
+nnoremap <buffer> <silent> x :NVimbolsToggleNode<CR>
@@ -23,6 +23,79 @@ if(g:nvimbols_enabled)
         let g:nvimbols_window_name = "nvimbols"
     endif
 
+    " Maximal number of symbols kept in memory (0: unbounded)
+    if(!exists('g:nvimbols_max_symbols'))
+        let g:nvimbols_max_symbols = 0
+    endif
+
+    " Approximate memory budget for symbols in bytes (0: unbounded)
+    if(!exists('g:nvimbols_max_memory'))
+        let g:nvimbols_max_memory = 0
+    endif
+
+    " Cursor moves are processed once the cursor rested for this many ms (0: immediately)
+    if(!exists('g:nvimbols_update_delay'))
+        let g:nvimbols_update_delay = 50
+    endif
+
+    " ...but at latest after this many ms of continuous movement (0: no limit)
+    if(!exists('g:nvimbols_update_max_wait'))
+        let g:nvimbols_update_max_wait = 500
+    endif
+
+    " Directory for the on-disk symbol cache, one file per project ('': disabled)
+    if(!exists('g:nvimbols_cache_dir'))
+        let g:nvimbols_cache_dir = ''
+    endif
+
+    " Speculatively load symbols while idle: 'targets' (first entries of the current
+    " symbol's references), 'visible' (symbols on visible lines) or '' (disabled)
+    if(!exists('g:nvimbols_prefetch'))
+        let g:nvimbols_prefetch = ''
+    endif
+
+    " Number of entries per reference list prefetched in 'targets' mode
+    if(!exists('g:nvimbols_prefetch_count'))
+        let g:nvimbols_prefetch_count = 5
+    endif
+
+    " Maximal number of prefetch requests queued or running at a time
+    if(!exists('g:nvimbols_prefetch_budget'))
+        let g:nvimbols_prefetch_budget = 4
+    endif
+
+    " Tree mode: levels below the root and children per node shown
+    if(!exists('g:nvimbols_tree_depth'))
+        let g:nvimbols_tree_depth = 3
+    endif
+    if(!exists('g:nvimbols_tree_fanout'))
+        let g:nvimbols_tree_fanout = 20
+    endif
+
+    " Record latencies of the hot path for :NVimbolsStats, keeping the last
+    " g:nvimbols_stats_samples per stage
+    if(!exists('g:nvimbols_stats'))
+        let g:nvimbols_stats = 0
+    endif
+    if(!exists('g:nvimbols_stats_samples'))
+        let g:nvimbols_stats_samples = 1000
+    endif
+
+    " Log file ('': disabled), minimal level ('debug', 'info', 'warning' or 'error'),
+    " size in bytes after which it is rotated and number of rotated files kept
+    if(!exists('g:nvimbols_log_file'))
+        let g:nvimbols_log_file = '/tmp/pylog'
+    endif
+    if(!exists('g:nvimbols_log_level'))
+        let g:nvimbols_log_level = 'info'
+    endif
+    if(!exists('g:nvimbols_log_max_size'))
+        let g:nvimbols_log_max_size = 1048576
+    endif
+    if(!exists('g:nvimbols_log_backups'))
+        let g:nvimbols_log_backups = 1
+    endif
+
 endif
 
 " }}}
@@ -34,6 +107,8 @@ if(g:nvimbols_enabled)
         autocmd BufEnter * :call nvimbols#bufenter()
         autocmd Filetype * :call nvimbols#filetype()
         autocmd InsertLeave * :call nvimbols#insertleave()
+        autocmd TextChanged * :call nvimbols#textchanged()
+        autocmd BufWritePost * :call nvimbols#bufwritepost()
         autocmd CursorMoved * :call nvimbols#cursormoved()
         autocmd VimLeave * :call nvimbols#vimleave()
     augroup end
@@ -51,6 +126,10 @@ if(g:nvimbols_enabled)
     command! NVimbolsClear :call nvimbols#command('clear')
     command! NVimbolsHelp :call nvimbols#command('help')
     command! NVimbolsSwitch :call nvimbols#command('switch_mode')
+    command! NVimbolsMore :call nvimbols#command('more')
+    command! NVimbolsTree :call nvimbols#command('tree')
+    command! NVimbolsTreeRelation :call nvimbols#command('tree_relation')
+    command! NVimbolsStats :call nvimbols#command('stats')
     " Commands when cursor is on symbol
     command! NVimbolsFollowTarget :call nvimbols#follow_quickjump("first_source_of_references", '')
     command! NVimbolsFollowParent :call nvimbols#follow_quickjump("first_source_of_is_child_of", '')
@@ -61,6 +140,7 @@ if(g:nvimbols_enabled)
     " Commands when cursor is in NVimbols window
     command! NVimbolsFollow :call nvimbols#follow_link('')
     command! NVimbolsFollowVertical :call nvimbols#follow_link('v')
+    command! NVimbolsToggleNode :call nvimbols#toggle_node()
 endif
 " }}}
 
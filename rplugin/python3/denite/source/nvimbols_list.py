@@ -12,11 +12,47 @@ class Source(Base):
         self.vars = {}
         self.matchers = ['matcher_ignore_globs', 'matcher_regexp']
 
+        self._content = None
+        self._candidate_hashes = set()
+        self._new_candidates = []
+
         self._nvimbols = None
+        self._nvimbols_obsid = None
+
+    def render(self):
+        self._content = self._nvimbols.render_denite('list')
+
+        new_candidates = []
+        for c in self._content.get_candidates():
+            if not c['__hash'] in self._candidate_hashes:
+                new_candidates += [c]
+                self._candidate_hashes.add(c['__hash'])
+
+        self._new_candidates += new_candidates
+
+    def on_init(self, context):
+        self._nvimbols = COMM.get('NVimbols')
+        if self._nvimbols is None:
+            return
+
+        self._nvimbols_obsid = self._nvimbols.on_update_view(lambda: self.render(), 'denite')
+
+        self._new_candidates = []
+        self._candidate_hashes = set()
+        self.render()
+
+    def on_close(self, context):
+        if(self._nvimbols_obsid is not None):
+            self._nvimbols.remove_on_update(self._nvimbols_obsid)
+            self._nvimbols.close_denite()
+
+        self._nvimbols_obsid = None
 
     def gather_candidates(self, context):
-        nvimbols = COMM.get('NVimbols')
-        if nvimbols is not None:
-            return nvimbols.render_denite(context, 'list')
-        else:
+        if self._content is None:
             return []
+
+        context['is_async'] = not self._content.is_complete()
+        result = self._new_candidates
+        self._new_candidates = []
+        return result
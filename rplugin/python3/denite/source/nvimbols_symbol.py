@@ -13,7 +13,7 @@ class Source(Base):
         self.matchers = ['matcher_fuzzy']
 
         self._content = None
-        self._candidate_hashes = []
+        self._candidate_hashes = set()
         self._new_candidates = []
 
         self._nvimbols = None
@@ -26,23 +26,22 @@ class Source(Base):
         for c in self._content.get_candidates():
             if not c['__hash'] in self._candidate_hashes:
                 new_candidates += [c]
-
-        for c in new_candidates:
-            self._candidate_hashes += [c['__hash']]
+                self._candidate_hashes.add(c['__hash'])
 
         self._new_candidates += new_candidates
 
     def on_init(self, context):
         self._nvimbols = COMM.get('NVimbols')
-        self._nvimbols_obsid = self._nvimbols.on_update(lambda: self.render())
+        self._nvimbols_obsid = self._nvimbols.on_update_view(lambda: self.render(), 'denite')
 
         self._new_candidates = []
-        self._candidate_hashes = []
+        self._candidate_hashes = set()
         self.render()
 
     def on_close(self, context):
         if(self._nvimbols_obsid is not None):
             self._nvimbols.remove_on_update(self._nvimbols_obsid)
+            self._nvimbols.close_denite()
 
         self._nvimbols_obsid = None
 
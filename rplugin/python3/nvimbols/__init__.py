@@ -1,14 +1,19 @@
 import neovim
 import os
 import time
+from queue import Queue
 from threading import Lock, Thread, Timer
 
 from nvimbols.content import Content, Wrapper, Highlight
+from nvimbols.debouncer import Debouncer
 from nvimbols.job_queue import JobQueue
+from nvimbols.renderer import BufferRenderer
 from nvimbols.util import find_rplugins, import_plugin, on_error, log
 from nvimbols.nvimbols import NVimbols
 from nvimbols.symbol import SymbolLocation
 from nvimbols.communicator import COMM
+from nvimbols.stats import STATS
+from nvimbols.logger import LOGGER
 
 @neovim.plugin
 class NVimbolsPlugin:
@@ -17,7 +22,6 @@ class NVimbolsPlugin:
         self._config = {}
         self._main = None
         self._sources = None
-        self._lock = Lock()
 
         self._content_if_deactivated = Content()
 
@@ -27,21 +31,53 @@ class NVimbolsPlugin:
         self._put_content_lock = Lock()
         self._put_content_queue = JobQueue(1, self._vim, True)
         self._content = None
+        self._renderer = BufferRenderer(self._vim)
 
-    def _dispatch(self, func, *args, **kwargs):
-        def wrapped():
-            with self._lock:
-                try:
-                    func(*args, **kwargs)
-                except Exception as err:
-                    on_error(self._vim, err)
+        """
+        Rendering runs on its own thread, so neither RPC calls nor graph notifications wait for it. Requests
+        made while a render is waiting are coalesced into it.
+        """
+        self._render_lock = Lock()
+        self._render_queue = JobQueue(1, self._vim)
+        self._force_put = False
 
-        Thread(target=wrapped).start()
+        """
+        RPC calls are handled one after another by a single long-lived thread; they only update state
+        and queue work, the RPC handlers themselves only enqueue
+        """
+        self._calls = Queue()
+        self._dispatcher = Thread(target=lambda: self._dispatch_loop(), daemon=True)
+        self._dispatcher.start()
+
+        """
+        Cursor moves are coalesced, only the latest location is processed. Timing is set in _init
+        """
+        self._location_debouncer = Debouncer(lambda args: self._dispatch(NVimbolsPlugin._update_location, self, args), vim=self._vim)
+
+    def _dispatch_loop(self):
+        while True:
+            func, args, kwargs, queued_at = self._calls.get()
+            if queued_at is not None:
+                STATS.record('rpc_wait', time.perf_counter() - queued_at)
+
+            try:
+                func(*args, **kwargs)
+            except Exception as err:
+                on_error(self._vim, err)
+
+    def _dispatch(self, func, *args, **kwargs):
+        self._calls.put((func, args, kwargs, time.perf_counter() if STATS.enabled else None))
 
     def _init(self, args):
         self._config = args[0]
         ft = args[1]
 
+        STATS.enable(self._config.get('nvimbols_stats', 0) != 0, self._config.get('nvimbols_stats_samples', None))
+        LOGGER.configure(self._config.get('nvimbols_log_file', None), self._config.get('nvimbols_log_level', None),
+                         self._config.get('nvimbols_log_max_size', None), self._config.get('nvimbols_log_backups', None))
+
+        self._location_debouncer.set_timing(self._config.get('nvimbols_update_delay', 0) / 1000., self._config.get('nvimbols_update_max_wait', 0) / 1000.)
+
         if(ft == "nvimbols" or ft == "denite"):
             return
 
@@ -98,16 +134,16 @@ class NVimbolsPlugin:
 
         if(selected_source is not None):
             log("  <> selected source: %s" % selected_source.name)
-            self._main = NVimbols(self, selected_source)
+            self._main = NVimbols(self, selected_source, self._config)
 
             """
             Enable automatic rendering
             """
-            self._main.on_update(lambda: self._render())
+            self._main.on_update_view(lambda: self._request_render(), 'render')
         else:
             log("  <> no source selected, deactivating")
             self._main = None
-            self._render()
+            self._request_render()
 
         COMM.set('NVimbols', self._main)
 
@@ -116,42 +152,74 @@ class NVimbolsPlugin:
         Do not lock inside threadsafe_call. This causes deadlocks
         """
         if self._put_content_lock.acquire(False):
+            t = time.perf_counter() if STATS.enabled else None
             try:
-                buf = None
-                for b in self._vim.buffers:
-                    if b.name.endswith(self._config['nvimbols_window_name']):
-                        buf = b
-                        break
-
-                if buf is not None:
-                    buf.api.set_option('modifiable', True)
+                buf = self._vim.call('bufnr', '^%s$' % self._config['nvimbols_window_name'])
 
-                    buf[:] = self._content.raw()
-                    for highlight in self._content.highlights():
-                        buf.add_highlight(highlight.name, highlight.line - 1, highlight.start_col - 1, highlight.end_col - 1 if highlight.end_col >= 1 else -1, -1)
-
-                    buf.api.set_option('modifiable', False)
-                
                 jumps = {
                     'links': self._content.links(),
                     'quickjumps': self._content.quickjumps()
                 }
-                self._vim.call("nvimbols#set_jumps", jumps)
+                self._renderer.put(buf, self._content, jumps)
 
             finally:
                 self._put_content_lock.release()
+                if t is not None:
+                    STATS.record('put_content', time.perf_counter() - t)
         else:
             return True
 
-    def _render(self, force_put=False):
-        content = self._content_if_deactivated if self._main is None else self._main.render()
+    def _request_render(self, force_put=False):
+        with self._render_lock:
+            self._force_put = self._force_put or force_put
+
+        if self._render_queue.is_empty():
+            self._render_queue.job(lambda: self._render())
+
+    def _render(self):
+        """
+        Only called on the render thread
+        """
+        with self._render_lock:
+            force_put = self._force_put
+            self._force_put = False
+
+        main = self._main
+        t = time.perf_counter() if STATS.enabled else None
+        content = self._content_if_deactivated if main is None else main.render()
+        if t is not None:
+            STATS.record('render', time.perf_counter() - t)
+
+        """
+        Unchanged content is usually the very same object (see NVimbols.render), otherwise compare fingerprints
+        """
+        changed = self._content is None or (content is not self._content and content.fingerprint() != self._content.fingerprint())
+
+        if force_put or changed:
+            if force_put:
+                """
+                Window has been (re)opened with an empty buffer
+                """
+                self._renderer.invalidate()
 
-        if force_put or self._content != content:
             self._content = content
             if self._put_content_queue.is_empty():
                 self._put_content_queue.job(lambda: self._put_content())
 
-        self._content = content
+    def location_stats(self):
+        """
+        Number of cursor moves received from neovim, dropped in favour of a later one, and processed
+        """
+        return self._location_debouncer.stats()
+
+    def renderer_stats(self):
+        return dict(self._renderer.stats)
+
+    def rpc_stats(self):
+        """
+        Number of RPC calls waiting for the dispatcher thread
+        """
+        return {'queued': self._calls.qsize()}
 
     def _update_location(self, args):
         if(self._main is None):
@@ -161,21 +229,37 @@ class NVimbolsPlugin:
         line = args[1]
         col = args[2]
 
+        """
+        First and last line visible in the window, if given
+        """
+        visible = (args[3], args[4]) if len(args) >= 5 else None
+
         location = SymbolLocation(filename, line, col)
-        self._main.update_location(location)
-        self._render()
+        self._main.update_location(location, visible)
 
-    def _command(self, args):
+    def _file_changed(self, args):
         if(self._main is None):
             return
 
-        self._main.command(args[0])
+        self._main.file_changed(args[0], args[1], args[2], args[3])
 
-    def _cancel(self, args):
+    def _file_written(self, args):
+        if(self._main is None):
+            return
+
+        self._main.file_written(args[0])
+
+    def _command(self, args):
         if(self._main is None):
             return
 
-        self._main.cancel()
+        self._main.command(*args)
+
+    def _cancel(self, args):
+        if(self._main is not None):
+            self._main.cancel()
+
+        LOGGER.flush()
 
     """
     Public asynchronous interface, immediately dispatched to own threads.
@@ -186,11 +270,19 @@ class NVimbolsPlugin:
 
     @neovim.function('_nvimbols_update_location')
     def update_location(self, args):
-        self._dispatch(NVimbolsPlugin._update_location, self, args)
+        self._location_debouncer.push(args)
 
     @neovim.function('_nvimbols_render')
     def render(self, args):
-        self._dispatch(NVimbolsPlugin._render, self, args[0] != 0 if len(args) > 0 else False)
+        self._request_render(args[0] != 0 if len(args) > 0 else False)
+
+    @neovim.function('_nvimbols_file_changed')
+    def file_changed(self, args):
+        self._dispatch(NVimbolsPlugin._file_changed, self, args)
+
+    @neovim.function('_nvimbols_file_written')
+    def file_written(self, args):
+        self._dispatch(NVimbolsPlugin._file_written, self, args)
 
     @neovim.function('_nvimbols_command')
     def command(self, args):
@@ -0,0 +1,120 @@
+import asyncio
+from threading import Thread, Lock
+
+from nvimbols.util import on_error
+
+
+class _Handle:
+    def __init__(self):
+        self.task = None
+        self.cancelled = False
+
+
+class AsyncRunner:
+    """
+    Runs coroutines of async sources on a single event loop in a dedicated thread, at most limit of them
+    at a time. The loop is started on first use.
+    """
+    def __init__(self, limit, vim=None):
+        self._limit = limit
+        self._vim = vim
+
+        self._lock = Lock()
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+
+        self._stats = {
+            'submitted': 0,
+            'running': 0,
+            'completed': 0,
+            'cancelled': 0
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _start(self):
+        """
+        Requires self._lock
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = Thread(target=lambda: self._run_loop(), daemon=True)
+            self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self._limit)
+        self._loop.run_forever()
+
+    def submit(self, coro, on_done):
+        """
+        Schedule coro; on_done(cancelled) is called on the loop thread once it has finished or has been cancelled.
+        Returns a handle to be passed to cancel.
+        """
+        handle = _Handle()
+        with self._lock:
+            self._start()
+            self._stats['submitted'] += 1
+
+        self._loop.call_soon_threadsafe(lambda: self._create_task(handle, coro, on_done))
+        return handle
+
+    def cancel(self, handle):
+        """
+        Cancel the coroutine, also if it is already running
+        """
+        with self._lock:
+            if self._loop is None:
+                return
+
+        self._loop.call_soon_threadsafe(lambda: self._cancel(handle))
+
+    def _create_task(self, handle, coro, on_done):
+        if handle.cancelled:
+            coro.close()
+            self._finish(on_done, True)
+            return
+
+        handle.task = self._loop.create_task(self._guarded(coro, on_done))
+
+    def _cancel(self, handle):
+        if handle.cancelled:
+            return
+
+        handle.cancelled = True
+        if handle.task is not None:
+            handle.task.cancel()
+
+    async def _guarded(self, coro, on_done):
+        cancelled = False
+        try:
+            async with self._semaphore:
+                with self._lock:
+                    self._stats['running'] += 1
+                try:
+                    await coro
+                finally:
+                    with self._lock:
+                        self._stats['running'] -= 1
+        except asyncio.CancelledError:
+            cancelled = True
+        except Exception as err:
+            on_error(self._vim, err)
+        finally:
+            """
+            If cancelled while waiting for the semaphore, coro has never been started
+            """
+            coro.close()
+            self._finish(on_done, cancelled)
+
+    def _finish(self, on_done, cancelled):
+        with self._lock:
+            self._stats['cancelled' if cancelled else 'completed'] += 1
+
+        try:
+            on_done(cancelled)
+        except Exception as err:
+            on_error(self._vim, err)
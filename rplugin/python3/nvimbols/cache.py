@@ -0,0 +1,261 @@
+import os
+import pickle
+import sqlite3
+import time
+from queue import Queue
+from threading import Thread, Lock, local
+
+from nvimbols.symbol import SymbolLocation, parse_location
+from nvimbols.loadable import LOADABLE_COUNT, LOADABLE_PAGE
+from nvimbols.util import log, on_error
+from nvimbols.logger import LOG_WARNING
+
+
+def _location_tuple(location):
+    return (location.filename, location.start_line, location.start_col, location.end_line, location.end_col)
+
+
+def _stat(filename):
+    try:
+        st = os.stat(filename)
+        return (st.st_mtime, st.st_size)
+    except OSError:
+        return None
+
+
+class GraphCache:
+    """
+    On-disk cache of loaded symbols and reference lists, one sqlite file per source and project.
+
+    Every entry stores mtime and size of all files it has been computed from (the file of the
+    wrapper and, for reference lists, the files of all entries). It is only used as long as none
+    of these files has changed. The file of the wrapper is looked at when the request is passed to
+    the source (see stamp), so a file saved while the source is working invalidates the result;
+    entries pointing into a file modified since then are not written at all.
+
+    Reads happen on first access: symbols of a file once the file is first visited, reference lists
+    once they are requested. Writes are passed to a background thread.
+    """
+    def __init__(self, path, vim=None):
+        self._path = path
+        self._vim = vim
+        self._lock = Lock()
+        self._db = None
+
+        """
+        Files whose symbols have been read already; warm holds _warm_lock while reading, so a second
+        call for the same file waits for the first one
+        """
+        self._warm = set()
+        self._warm_lock = Lock()
+
+        """
+        Set while applying cached data, so it is not written back
+        """
+        self._applying = local()
+
+        self._writes = Queue()
+        self._writer = None
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'writes': 0,
+            'skipped': 0
+        }
+
+    def _connect(self):
+        """
+        Requires self._lock
+        """
+        if self._db is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._db = sqlite3.connect(self._path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (filename TEXT, location TEXT, kind TEXT, level TEXT, data BLOB, deps BLOB, PRIMARY KEY (location, kind))")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_filename ON entries (filename, kind)")
+            self._db.commit()
+        return self._db
+
+    def _kind(self, params):
+        if params['type'] == 'symbol':
+            return 'symbol'
+        return '%s:%s' % (params['type'], params['reference'].name)
+
+    def _valid(self, deps):
+        return all(_stat(filename) == stat for filename, stat in deps)
+
+    def _read(self, query, args):
+        try:
+            with self._lock:
+                return self._connect().execute(query, args).fetchall()
+        except Exception as err:
+            log("[cache] read failed: %s" % err, LOG_WARNING)
+            return []
+
+    def is_applying(self):
+        return getattr(self._applying, 'active', False)
+
+    def _apply(self, func):
+        self._applying.active = True
+        try:
+            func()
+        finally:
+            self._applying.active = False
+
+    def is_warm(self, filename):
+        return filename in self._warm
+
+    def warm(self, graph, filename):
+        """
+        Create wrappers for all cached symbols of filename, only on first call per file. Reads the database,
+        so it is run as a job, not on the RPC thread.
+        """
+        with self._warm_lock:
+            if filename in self._warm:
+                return
+
+            for location, level, data, deps in self._read("SELECT location, level, data, deps FROM entries WHERE filename = ? AND kind = 'symbol'", (filename, )):
+                try:
+                    if not self._valid(pickle.loads(deps)):
+                        self.stats['stale'] += 1
+                        continue
+
+                    symbol = pickle.loads(data)
+                    wrapper = graph.create_wrapper(parse_location(location))
+                    if level in wrapper.symbol.levels and not wrapper.symbol.is_loaded(level) and not wrapper.symbol.is_loading():
+                        self._apply(lambda: wrapper.symbol.set(symbol, level))
+                        self.stats['hits'] += 1
+                except Exception as err:
+                    log("[cache] could not load symbol: %s" % err, LOG_WARNING)
+
+            self._warm.add(filename)
+
+    def stamp(self, filename):
+        """
+        Taken right before the source is asked to load data for a wrapper in filename, and passed to store as
+        params['cache_stamp']: the time and the state of filename the result is stored with
+        """
+        return (time.time(), filename, _stat(filename))
+
+    def load(self, graph, loadable, params):
+        """
+        Try to satisfy a request from the cache. Returns True if successful.
+        """
+        wrapper = params['wrapper']
+        rows = self._read("SELECT level, data, deps FROM entries WHERE location = ? AND kind = ?", (str(wrapper.location), self._kind(params)))
+        if len(rows) == 0:
+            self.stats['misses'] += 1
+            return False
+
+        level, data, deps = rows[0]
+        try:
+            if level not in loadable.levels or loadable.levels.index(level) < loadable.levels.index(params['requested_level']):
+                self.stats['misses'] += 1
+                return False
+
+            if not self._valid(pickle.loads(deps)):
+                self.stats['stale'] += 1
+                return False
+
+            data = pickle.loads(data)
+            if params['type'] != 'symbol':
+                data = [graph.create_wrapper(SymbolLocation(*location)) for location in data]
+        except Exception as err:
+            log("[cache] could not load entry: %s" % err, LOG_WARNING)
+            return False
+
+        self._apply(lambda: loadable.set(data, level))
+        self.stats['hits'] += 1
+        return True
+
+    def store(self, loadable, params):
+        """
+        Queue loadable's current data for writing
+        """
+        if self.is_applying():
+            return
+
+        """
+        Counts and pages are meant to be cheap, and the entry could not hold the total anyway
+        """
+        if loadable.loaded_level() in (LOADABLE_COUNT, LOADABLE_PAGE):
+            return
+
+        """
+        Data not loaded by the source since stamp (e.g. passed on from an identical request) is not stored
+        """
+        stamp = params.get('cache_stamp')
+        if stamp is None:
+            return
+
+        wrapper = params['wrapper']
+        data = loadable.get()
+        if params['type'] == 'symbol':
+            files = [wrapper.location.filename]
+        else:
+            data = [_location_tuple(w.location) for w in data] if data is not None else []
+            files = set([wrapper.location.filename] + [location[0] for location in data])
+
+        self._writes.put((wrapper.location.filename, str(wrapper.location), self._kind(params), loadable.loaded_level(), data, files, stamp))
+
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = Thread(target=lambda: self._write_loop(), daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            items = [self._writes.get()]
+            while not self._writes.empty():
+                items += [self._writes.get()]
+
+            rows = []
+            for filename, location, kind, level, data, files, stamp in items:
+                try:
+                    deps = self._deps(files, stamp)
+                    if deps is None:
+                        self.stats['skipped'] += 1
+                        continue
+                    rows += [(filename, location, kind, level, pickle.dumps(data), pickle.dumps(deps))]
+                except Exception as err:
+                    log("[cache] could not store entry: %s" % err, LOG_WARNING)
+
+            try:
+                with self._lock:
+                    db = self._connect()
+                    db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    db.commit()
+                self.stats['writes'] += len(rows)
+            except Exception as err:
+                on_error(self._vim, err)
+
+    def _deps(self, files, stamp):
+        """
+        (filename, stat) of files for an entry computed since stamp, None if any of them has been modified
+        since then. Files are compared by mtime with a margin of a second, as some filesystems store no more.
+        """
+        started, stamped_file, stamped_stat = stamp
+        deps = []
+        for f in files:
+            if f == stamped_file:
+                deps += [(f, stamped_stat)]
+                continue
+
+            stat = _stat(f)
+            if stat is not None and stat[0] >= started - 1.:
+                return None
+            deps += [(f, stat)]
+
+        return deps
+
+    def clear(self):
+        with self._lock:
+            self._warm = set()
+            try:
+                db = self._connect()
+                db.execute("DELETE FROM entries")
+                db.commit()
+            except Exception as err:
+                log("[cache] clear failed: %s" % err, LOG_WARNING)
@@ -1,5 +1,4 @@
 from nvimbols.util import log
-import copy
 
 
 class Component:
@@ -77,54 +76,116 @@ class Highlight(Component):
         return not self.__eq__(other)
 
 
+class _PlacedHighlight:
+    """
+    Part of a Highlight on a single line
+    """
+    __slots__ = ('name', 'line', 'start_col', 'end_col')
+
+    def __init__(self, name, line, start_col, end_col):
+        self.name = name
+        self.line = line
+        self.start_col = start_col
+        self.end_col = end_col
+
+
 class Content:
     def __init__(self):
-        self._raw = ""
+        """
+        Text as list of lines, each line a list of fragments. Position of the next character is tracked
+        as (self._line, self._col), both 1-based.
+        """
+        self._lines = [[]]
+        self._line = 1
+        self._col = 1
+        self._length = 0
+        self._raw = None
+
+        """
+        Hash over everything appended so far, see fingerprint()
+        """
+        self._fingerprint = 0
+
+        """
+        Placements of highlights and links as (kind, line, start_col, end_col, name or target)
+        """
         self._components = []
         self._quickjumps = {}
 
     def current(self):
-        line = self._raw.count('\n') + 1
-        col = len(self._raw) - self._raw.rfind('\n')
-        return line, col
+        return self._line, self._col
 
     def __iadd__(self, data):
         return self.append(data)
 
-    def append(self, data):
-        if(isinstance(data, Component)):
-            start_line, start_col = self.current()
+    def _append_text(self, text):
+        parts = text.split('\n')
 
-            for c in data.children:
-                self += c
+        self._lines[-1].append(parts[0])
+        self._col += len(parts[0])
+
+        for part in parts[1:]:
+            self._lines.append([part])
+            self._line += 1
+            self._col = len(part) + 1
 
-            end_line, end_col = self.current()
+        self._length += len(text)
+        self._raw = None
+        self._fingerprint = hash((self._fingerprint, text))
 
-            for line in range(start_line, end_line + 1):
-                d = copy.copy(data)
-                d.line, d.start_col, d.end_col = line, start_col if line == start_line else 1, end_col if line == end_line else -1
-                if(d.start_col != d.end_col):
-                    self._components.append(d)
+    def append(self, data):
+        if(isinstance(data, Component)):
+            start_line, start_col = self._line, self._col
 
-            data.end_position = len(self._raw)
+            for c in data.children:
+                self.append(c)
+
+            end_line, end_col = self._line, self._col
+
+            if isinstance(data, Highlight):
+                kind, value = Highlight, data.name
+            elif isinstance(data, Link):
+                kind, value = Link, data.target
+            else:
+                kind = None
+
+            if kind is not None:
+                for line in range(start_line, end_line + 1):
+                    s = start_col if line == start_line else 1
+                    e = end_col if line == end_line else -1
+                    if(s != e):
+                        placement = (kind, line, s, e, value)
+                        self._components.append(placement)
+                        self._fingerprint = hash((self._fingerprint, placement))
+
+            data.end_position = self._length
         else:
-            self._raw += str(data)
+            self._append_text(str(data))
 
         return self
 
+    def fingerprint(self):
+        """
+        Hash of text, placements and quickjumps, computed while building. Contents built by the same sequence
+        of appends have equal fingerprints; differing fingerprints imply differing contents.
+        """
+        return self._fingerprint
+
     def raw(self):
-        return self._raw.split('\n')
+        if self._raw is None:
+            self._raw = ["".join(line) for line in self._lines]
+        return list(self._raw)
 
     def highlights(self):
-        for c in self._components:
-            if(isinstance(c, Highlight)):
-                yield c
+        for kind, line, start_col, end_col, value in self._components:
+            if kind is Highlight:
+                yield _PlacedHighlight(value, line, start_col, end_col)
 
     def links(self):
         result = {}
-        for c in self._components:
-            if(isinstance(c, Link)):
-                result["%i:%i:%i" % (c.line, c.start_col, c.end_col)] = str(c.target)
+        for kind, line, start_col, end_col, value in self._components:
+            if kind is Link:
+                result["%i:%i:%i" % (line, start_col, end_col)] = str(value)
 
         return result
 
@@ -133,17 +194,16 @@ class Content:
 
     def add_quickjump(self, name, target):
         self._quickjumps[name] = target
+        self._fingerprint = hash((self._fingerprint, name, target))
 
     def __eq__(self, other):
         if other is None:
             return False
 
-        return self._raw == other._raw and self._components == other._components
+        if self._fingerprint != other._fingerprint:
+            return False
+
+        return self.raw() == other.raw() and self._components == other._components and self._quickjumps == other._quickjumps
 
     def __ne__(self, other):
         return not self.__eq__(other)
-
-
-
-
-
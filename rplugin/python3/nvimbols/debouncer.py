@@ -0,0 +1,94 @@
+import time
+from threading import Thread, Lock, Condition
+
+from nvimbols.util import on_error
+
+
+class Debouncer:
+    """
+    Coalesces calls: only the latest arguments are passed on to func, once no new call has arrived
+    for delay seconds, but at latest max_wait seconds after the first call that is pending.
+    """
+    def __init__(self, func, delay=0., max_wait=0., vim=None):
+        self._func = func
+        self._delay = delay
+        self._max_wait = max_wait
+        self._vim = vim
+
+        self._cond = Condition(Lock())
+        self._thread = None
+
+        self._pending = None
+        self._first_at = None
+        self._last_at = None
+
+        self._stats = {
+            'received': 0,
+            'dropped': 0,
+            'processed': 0
+        }
+
+    def set_timing(self, delay, max_wait):
+        with self._cond:
+            self._delay = delay
+            self._max_wait = max_wait
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats)
+
+    def push(self, *args):
+        with self._cond:
+            self._stats['received'] += 1
+
+            if self._delay <= 0:
+                self._stats['processed'] += 1
+                immediate = True
+            else:
+                immediate = False
+                now = time.time()
+                if self._pending is not None:
+                    self._stats['dropped'] += 1
+                else:
+                    self._first_at = now
+
+                self._pending = args
+                self._last_at = now
+
+                if self._thread is None:
+                    self._thread = Thread(target=lambda: self._loop(), daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+
+        if immediate:
+            self._call(args)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending is None:
+                        self._cond.wait()
+                        continue
+
+                    due = self._last_at + self._delay
+                    if self._max_wait > 0:
+                        due = min(due, self._first_at + self._max_wait)
+
+                    now = time.time()
+                    if now >= due:
+                        break
+                    self._cond.wait(due - now)
+
+                args = self._pending
+                self._pending = None
+                self._stats['processed'] += 1
+
+            self._call(args)
+
+    def _call(self, args):
+        try:
+            self._func(*args)
+        except Exception as err:
+            on_error(self._vim, err)
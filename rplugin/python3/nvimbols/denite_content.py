@@ -5,6 +5,7 @@ class DeniteContent:
 
     def __iadd__(self, candidates):
         self._candidates += candidates
+        return self
 
     def get_candidates(self):
         return self._candidates
@@ -1,18 +1,183 @@
 from nvimbols.symbol import SymbolLocation
 from nvimbols.util import log, on_error, on_error_wrap
-from nvimbols.loadable import Loadable
+from nvimbols.loadable import Loadable, LOADABLE_COUNT, LOADABLE_PAGE
 from nvimbols.observable import Observable
 from nvimbols.job_queue import JobQueue
+from nvimbols.location_index import LocationIndex
+from nvimbols.async_runner import AsyncRunner
+from nvimbols.process_runner import ProcessRunner
+from nvimbols.traversal import traverse, TRAVERSE_BFS
+from nvimbols.stats import STATS
+from threading import Lock, local
+from collections import OrderedDict
+from collections.abc import Mapping
+from weakref import WeakSet
 import time
 
 
+"""
+Rough memory footprint in bytes, used for the approximate memory budget of the graph. A wrapper includes its
+location, its symbol Loadable and its entries in the index and LRU; reference lists add one _ReferenceLists per
+direction accessed and one Loadable per list.
+"""
+_WRAPPER_BYTES = 1100
+_REFERENCE_LISTS_BYTES = 240
+_LOADABLE_BYTES = 320
+_SYMBOL_BYTES = 250
+_ENTRY_BYTES = 8
+
+
+"""
+Names of the source methods called by _load for one and for several requests of a type, used as STATS stages
+"""
+_LOAD_STAGES = {
+    'symbol': ('load_symbol', 'load_symbols'),
+    'target': ('load_target_of', 'load_targets_of'),
+    'source': ('load_source_of', 'load_sources_of')
+}
+
+
+"""
+Job priorities, lower values are processed first
+"""
+PRIORITY_CURRENT = 0
+PRIORITY_PREVIEW = 1
+PRIORITY_FULL = 2
+PRIORITY_PREFETCH = 3
+
+
+"""
+Guards the creation of _ReferenceLists on first access of wrapper.target_of or source_of from several threads, as
+Loadables created by the losing thread would be lost along with the data set on them
+"""
+_LISTS_LOCK = Lock()
+
+
+class _ReferenceLists(Mapping):
+    """
+    reference name -> Loadable of one direction (wrapper.target_of or wrapper.source_of). Most wrappers are only
+    ever displayed as an entry of another wrapper's list, so Loadables are created on first access.
+    """
+    __slots__ = ('_wrapper', '_type', '_loadables')
+
+    def __init__(self, wrapper, type_):
+        self._wrapper = wrapper
+        self._type = type_
+        self._loadables = {}
+
+    def __getitem__(self, name):
+        loadable = self._loadables.get(name)
+        if loadable is not None:
+            return loadable
+
+        graph = self._wrapper._graph
+        reference = graph.reference(name)
+        if reference is None:
+            raise KeyError(name)
+
+        """
+        setdefault, so concurrent first accesses end up with the same Loadable
+        """
+        return self._loadables.setdefault(name, Loadable(graph, {'type': self._type, 'reference': reference, 'wrapper': self._wrapper}, graph.levels, graph.page_size))
+
+    def __contains__(self, name):
+        return self._wrapper._graph.reference(name) is not None
+
+    def __iter__(self):
+        return (ref.name for ref in self._wrapper._graph.references)
+
+    def __len__(self):
+        return len(self._wrapper._graph.references)
+
+    def created(self):
+        """
+        Loadables accessed so far; a copy, as other threads may add some meanwhile
+        """
+        return list(self._loadables.values())
+
+
 class _SymbolWrapper:
+    __slots__ = ('location', 'symbol', '_graph', '_target_of', '_source_of')
+
     def __init__(self, graph, location):
         self.location = location
+        self._graph = graph
 
         self.symbol = Loadable(graph, {'type': 'symbol', 'wrapper': self})
-        self.target_of = {ref.name: Loadable(graph, {'type': 'target', 'reference': ref, 'wrapper': self}) for ref in graph.references}
-        self.source_of = {ref.name: Loadable(graph, {'type': 'source', 'reference': ref, 'wrapper': self}) for ref in graph.references}
+        self._target_of = None
+        self._source_of = None
+
+    @property
+    def target_of(self):
+        if self._target_of is None:
+            with _LISTS_LOCK:
+                if self._target_of is None:
+                    self._target_of = _ReferenceLists(self, 'target')
+        return self._target_of
+
+    @property
+    def source_of(self):
+        if self._source_of is None:
+            with _LISTS_LOCK:
+                if self._source_of is None:
+                    self._source_of = _ReferenceLists(self, 'source')
+        return self._source_of
+
+    def loadables(self, create=False):
+        """
+        The symbol and the reference lists accessed so far; all of them if create is set
+        """
+        if create:
+            yield self.symbol
+            yield from self.target_of.values()
+            yield from self.source_of.values()
+            return
+
+        yield self.symbol
+        if self._target_of is not None:
+            yield from self._target_of.created()
+        if self._source_of is not None:
+            yield from self._source_of.created()
+
+    def neighbours(self):
+        """
+        All wrappers this wrapper's loaded reference lists point to
+        """
+        for loadable in self.loadables():
+            if loadable is not self.symbol and loadable.get() is not None:
+                yield from loadable.get()
+
+    def version_key(self):
+        """
+        Changes whenever anything rendered along with this wrapper changes: its own loadables and the
+        symbols (and thereby locations) of its neighbours
+        """
+        return (tuple(loadable.version for loadable in self.loadables()),
+                tuple(w.symbol.version for w in self.neighbours()))
+
+    def is_loading(self):
+        return any(loadable.is_loading() for loadable in self.loadables())
+
+    def approx_size(self):
+        size = _WRAPPER_BYTES
+        for lists in (self._target_of, self._source_of):
+            if lists is not None:
+                size += _REFERENCE_LISTS_BYTES
+        for loadable in self.loadables():
+            if loadable is self.symbol:
+                size += _SYMBOL_BYTES if loadable.get() is not None else 0
+            else:
+                size += _LOADABLE_BYTES
+                if loadable.get() is not None:
+                    size += _ENTRY_BYTES * len(loadable.get())
+        return size
+
+    def reset(self):
+        """
+        Drop all loaded data, releasing the references to other wrappers
+        """
+        for loadable in self.loadables():
+            loadable.reset()
 
 
 class SymbolsGraph(Observable):
@@ -20,64 +185,975 @@ class SymbolsGraph(Observable):
         super().__init__()
 
         self.references = source.references
+        self._references = {ref.name: ref for ref in source.references}
+        self.levels = source.levels
+        self.page_size = source.page_size
         self._source = source
         self._parent = parent
 
-        self._queue = JobQueue(self._source.tasks)
+        self._queue = JobQueue(self._source.tasks, name='queue')
+
+        """
+        Pass notifications from job_queue through, together with the wrappers changed since the last one
+        """
+        self._queue.on_update(lambda: self._on_queue_update())
+
+        """
+        Index of _SymbolWrapper by location
+        """
+        self._lock = Lock()
+        self._data = LocationIndex()
+
+        """
+        Capacity as number of wrappers and approximate size in bytes, 0 means unbounded.
+        Least recently used wrappers are evicted once either is exceeded.
+        """
+        self._max_wrappers = 0
+        self._max_bytes = 0
+
+        """
+        id(wrapper) -> wrapper, least recently used first
+        """
+        self._lru = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+
+        """
+        key -> {id(wrapper): wrapper}, wrappers which must not be evicted
+        """
+        self._pinned = {}
+
+        """
+        Incremented on every change of location; requests of older epochs are deprioritised,
+        symbol requests for locations the cursor has left are dropped
+        """
+        self._epoch = 0
+        self._current = None
+
+        """
+        Last location passed to require_at_location; _require_lock serialises it with the job warming the cache
+        """
+        self._required = None
+        self._require_lock = Lock()
+
+        """
+        Requests are queued as jobs {'requests': [...], 'entry': handle}, see _dispatch and _add_to_batch;
+        id(loadable) -> job for all waiting requests
+        """
+        self._pending = {}
+
+        """
+        Optional GraphCache persisting loaded data across sessions
+        """
+        self._cache = None
+
+        """
+        filename -> reference list Loadables with entries in that file
+        """
+        self._referrers = {}
 
         """
-        Pass notifications from job_queue through
+        Wrappers with a Loadable set since the last notification
         """
-        self._queue.on_update(lambda: self._notify())
+        self._dirty = set()
 
         """
-        List of _SymbolWrapper
+        Event loop for sources implementing async_load_*
         """
-        self._data = []
+        self._async = AsyncRunner(self._source.async_tasks) if self._source.supports_async() else None
+
+        """
+        Process pool for sources implementing compute_*, with source.processes > 0
+        """
+        self._processes = None
+        if self._source.processes > 0 and self._source.supports_process():
+            self._processes = ProcessRunner(self._source, self._source.processes)
+
+        """
+        id(loadable) -> request running on the event loop or in the process pool
+        """
+        self._in_flight = {}
+        self._in_flight_skipped = 0
+
+        """
+        Requests waiting for or running a source call, keyed by _shared_key, with identical requests waiting for
+        their result. A request is the tuple (loadable, params, priority, key), the key being taken when it is made.
+        """
+        self._shared = {}
+        self.coalesce_stats = {
+            'hits': 0,
+            'misses': 0
+        }
+
+        """
+        filename -> wrappers of all symbols in that file (see Base.load_file) sorted by location, None while loading.
+        Observers are notified with the key ('outline', filename) once an outline has been loaded or dropped.
+        """
+        self._outlines = {}
+        self._pinned_outline = None
+
+        """
+        (type, priority) -> job of requests still collecting, see _add_to_batch
+        """
+        self._batches = {}
+
+        """
+        Optional Prefetcher, run whenever the queue runs idle. Prefetch requests are limited to
+        self._prefetch_budget jobs queued or running at a time.
+        """
+        self._prefetcher = None
+        self._prefetch_budget = 0
+        self._prefetch_outstanding = 0
+        self._prefetching = local()
+
+        self.eviction_stats = {
+            'evicted': 0,
+            'skipped_pinned': 0,
+            'skipped_loading': 0
+        }
 
     def cancel(self):
+        """
+        Drop all waiting requests and cancel those on the event loop or in the process pool. The queue discards its
+        jobs without calling on_drop, so their requests, and those waiting for an identical one, are aborted here.
+        """
         self._queue.cancel()
 
+        with self._lock:
+            jobs = list({id(job): job for job in self._pending.values()}.values())
+            followers = [follower for shared in self._shared.values() for follower in shared['followers']]
+            self._shared = {}
+
+            """
+            A load_file job dropped from the queue would keep outline() returning None, have it requested again
+            """
+            self._outlines = {filename: wrappers for filename, wrappers in self._outlines.items() if wrappers is not None}
+
+        requests = []
+        for job in jobs:
+            requests += self._take(job)
+        self._drop_requests(requests + followers)
+
+        self._cancel_in_flight(True)
+
+    def shutdown(self):
+        """
+        cancel, and stop the worker processes; on VimLeave
+        """
+        self.cancel()
+        if self._processes is not None:
+            self._processes.shutdown()
+
+    def set_cache(self, cache):
+        self._cache = cache
+
+    def set_prefetcher(self, prefetcher, budget):
+        self._prefetcher = prefetcher
+        self._prefetch_budget = budget
+
+    def set_capacity(self, max_wrappers=0, max_bytes=0):
+        self._max_wrappers = max_wrappers
+        self._max_bytes = max_bytes
+
+    def queue_stats(self):
+        return self._queue.stats()
+
+    def async_stats(self):
+        return self._async.stats() if self._async is not None else None
+
+    def process_stats(self):
+        return self._processes.stats() if self._processes is not None else None
+
+    def current(self):
+        return self._current
+
+    def reference(self, name):
+        return self._references.get(name)
+
+    def in_lines(self, filename, first, last):
+        with self._lock:
+            return self._data.in_lines(filename, first, last)
+
+    def is_idle(self):
+        """
+        True if no jobs are waiting
+        """
+        return self._queue.is_empty()
+
+    def request_prefetch(self, loadable, level):
+        """
+        Request loadable with lowest priority, dropped once the location changes. Returns False if the
+        prefetch budget is exhausted.
+        """
+        with self._lock:
+            if self._prefetch_outstanding >= self._prefetch_budget:
+                return False
+
+        self._prefetching.active = True
+        try:
+            loadable.request(level)
+        finally:
+            self._prefetching.active = False
+
+        return True
+
+    def _prefetch_done(self):
+        with self._lock:
+            self._prefetch_outstanding -= 1
+
+    def _priority(self, loadable, params):
+        if getattr(self._prefetching, 'active', False):
+            return PRIORITY_PREFETCH
+        elif params['type'] == 'symbol' and params['wrapper'] is self._current:
+            return PRIORITY_CURRENT
+        elif params['requested_level'] != loadable.levels[-1]:
+            """
+            Any level short of the complete data, e.g. LOADABLE_PREVIEW
+            """
+            return PRIORITY_PREVIEW
+        else:
+            return PRIORITY_FULL
+
     def on_request(self, loadable, params):
-        self._queue.job(lambda: self._on_request(loadable, params))
+        priority = self._priority(loadable, params)
+        request = (loadable, params, priority, self._shared_key(params))
+
+        if priority == PRIORITY_PREFETCH:
+            with self._lock:
+                self._prefetch_outstanding += 1
+
+        if self._join(request):
+            return
+
+        self._dispatch(request)
+
+    def _shared_key(self, params):
+        location = params['wrapper'].location
+        return (params['type'], params['reference'].name if 'reference' in params else None,
+                (location.filename, location.start_line, location.start_col, location.end_line, location.end_col),
+                params['requested_level'], params.get('offset'), params.get('limit'))
+
+    def _join(self, request):
+        """
+        If an identical request (same type, reference, location and level) is waiting or running with at least the
+        same priority, wait for its result instead of asking the source again. Returns True in this case.
+        """
+        loadable, params, priority, key = request
+        with self._lock:
+            shared = self._shared.get(key)
+            if shared is not None and shared['request'][0] is not loadable and shared['request'][2] <= priority:
+                shared['followers'] += [request]
+                self.coalesce_stats['hits'] += 1
+                return True
+
+            if shared is None:
+                self._shared[key] = {'request': request, 'followers': []}
+            self.coalesce_stats['misses'] += 1
+            return False
+
+    def _share_result(self, request):
+        """
+        Pass the result of a finished request on to the requests waiting for it. If it has not been loaded (dropped
+        or failed), followers which would be dropped as well are aborted, all others are dispatched themselves.
+
+        The loadable might have been requested again meanwhile (see Loadable.set), so only the entry this very
+        request leads is removed.
+        """
+        loadable, params, priority, key = request
+        with self._lock:
+            shared = self._shared.get(key)
+            if shared is None or shared['request'] is not request:
+                return
+
+            del self._shared[key]
+
+        for follower in shared['followers']:
+            f_loadable, f_params, f_priority, f_key = follower
+            if loadable.is_loaded(f_params['requested_level']):
+                if f_params['type'] == 'symbol':
+                    location, f_location = params['wrapper'].location, f_params['wrapper'].location
+                    f_location.start_line, f_location.start_col = location.start_line, location.start_col
+                    f_location.end_line, f_location.end_col = location.end_line, location.end_col
+                    f_loadable.set(loadable.get(), loadable.loaded_level())
+                    self._reindex([f_params])
+                else:
+                    f_loadable.set(list(loadable.get()), loadable.loaded_level(), loadable.total)
+                self._request_done(follower)
+            elif f_priority in (PRIORITY_CURRENT, PRIORITY_PREFETCH):
+                self._request_done(follower)
+                f_loadable.abort()
+            else:
+                self._dispatch(follower)
+
+    def _dispatch(self, request):
+        loadable, params, priority, key = request
+        if self._source.batch_size > 1 and self._source.supports_batch(params['type']) and \
+                not self._source.supports_async(params['type']) and not self._source.supports_process(params['type']):
+            self._add_to_batch(request, priority)
+            return
+
+        job = {'requests': [request], 'entry': None}
+        with self._lock:
+            self._pending[id(loadable)] = job
+
+        """
+        Requests for the current location and prefetches are dropped once the location changes
+        """
+        on_drop = (lambda: self._drop_job(job)) if priority in (PRIORITY_CURRENT, PRIORITY_PREFETCH) else None
+        entry = self._queue.job(lambda: self._run_job(job), priority, on_drop=on_drop)
+        with self._lock:
+            job['entry'] = entry
+
+    def _add_to_batch(self, request, priority):
+        """
+        Requests of the same type and priority are collected in one job until it starts running,
+        it is full (batch_size) or batch_window has passed since the first request
+        """
+        key = (request[1]['type'], priority)
+        with self._lock:
+            job = self._batches.get(key)
+            if job is not None and len(job['requests']) < self._source.batch_size:
+                job['requests'] += [request]
+                self._pending[id(request[0])] = job
 
-    def _on_request(self, loadable, params):
+                """
+                A batch left from an earlier epoch (see set_epoch) waits behind all current jobs, move it along with
+                the request joining it
+                """
+                if job['entry'] is not None and self._queue.is_stale(job['entry']):
+                    entry = self._queue.promote(job['entry'], priority)
+                    if entry is not None:
+                        job['entry'] = entry
+                return
+
+            job = {'requests': [request], 'entry': None, 'batch': key, 'created': time.time()}
+            self._batches[key] = job
+            self._pending[id(request[0])] = job
+
+            on_drop = (lambda: self._drop_job(job)) if priority in (PRIORITY_CURRENT, PRIORITY_PREFETCH) else None
+            job['entry'] = self._queue.job(lambda: self._run_job(job), priority, on_drop=on_drop)
+
+    def _promote(self, loadable):
+        """
+        Move the job of a waiting request (and of its batch) to the front of the queue
+        """
+        with self._lock:
+            if loadable.is_loading():
+                shared = self._shared.get(self._shared_key(loadable.params()))
+                if shared is not None:
+                    """
+                    Waiting for an identical request, promote that one
+                    """
+                    loadable = shared['request'][0]
+
+            job = self._pending.get(id(loadable))
+            entry = job['entry'] if job is not None else None
+
+        if entry is None:
+            return False
+
+        new_entry = self._queue.promote(entry, PRIORITY_CURRENT)
+        if new_entry is None:
+            return False
+
+        with self._lock:
+            job['entry'] = new_entry
+        return True
+
+    def _take(self, job):
+        """
+        Requests of job, each handed out only once: a job dropped by cancel might still be run afterwards
+        """
+        with self._lock:
+            if 'batch' in job and self._batches.get(job['batch']) is job:
+                del self._batches[job['batch']]
+
+            requests = job['requests']
+            job['requests'] = []
+            for request in requests:
+                if self._pending.get(id(request[0])) is job:
+                    del self._pending[id(request[0])]
+            return requests
+
+    def _run_job(self, job):
+        if 'batch' in job:
+            remaining = job['created'] + self._source.batch_window - time.time()
+            if remaining > 0 and len(job['requests']) < self._source.batch_size:
+                time.sleep(remaining)
+
+        self._run_requests(self._take(job))
+
+    def _drop_job(self, job):
+        self._drop_requests(self._take(job))
+
+    def _drop_requests(self, requests):
+        for request in requests:
+            self._request_done(request)
+            request[0].abort()
+
+    def _request_done(self, request):
+        request[1].pop('cache_stamp', None)
+        if request[2] == PRIORITY_PREFETCH:
+            self._prefetch_done()
+        self._share_result(request)
+
+    def _run_requests(self, requests):
+        todo = []
+        for request in requests:
+            loadable, params, priority, key = request
+            if self._cache is not None and self._cache.load(self, loadable, params):
+                self._request_done(request)
+            else:
+                if self._cache is not None:
+                    params['cache_stamp'] = self._cache.stamp(params['wrapper'].location.filename)
+                todo += [request]
+
+        if len(todo) == 0:
+            return
+
+        type_ = todo[0][1]['type']
+        if self._async is not None and self._source.supports_async(type_):
+            for request in todo:
+                self._run_async(request)
+            return
+
+        if self._source.supports_process(type_):
+            for request in todo:
+                self._run_process(request)
+            return
+
+        try:
+            self._load([request[1] for request in todo])
+        finally:
+            for request in todo:
+                self._request_done(request)
+
+    def _load(self, params_list):
+        type_ = params_list[0]['type']
+        t = time.perf_counter() if STATS.enabled else None
+        try:
+            if len(params_list) > 1:
+                if type_ == 'symbol':
+                    self._source.load_symbols(params_list)
+                elif type_ == 'target':
+                    self._source.load_targets_of(params_list)
+                elif type_ == 'source':
+                    self._source.load_sources_of(params_list)
+            else:
+                if type_ == 'symbol':
+                    self._source.load_symbol(params_list[0])
+                elif type_ == 'target':
+                    self._source.load_target_of(params_list[0])
+                elif type_ == 'source':
+                    self._source.load_source_of(params_list[0])
+        finally:
+            if t is not None:
+                STATS.record(_LOAD_STAGES[type_][len(params_list) > 1], time.perf_counter() - t)
+            self._reindex(params_list)
+
+    def _reindex(self, params_list):
+        """
+        load_symbol usually extends wrapper.location over the whole symbol
+        """
+        with self._lock:
+            for params in params_list:
+                if params['type'] == 'symbol':
+                    self._data.reindex(params['wrapper'])
+
+    def _run_async(self, request):
+        """
+        Hand the request to the event loop; the worker thread is free again immediately
+        """
+        loadable, params, priority, key = request
+        type_ = params['type']
+        if type_ == 'symbol':
+            coro = self._source.async_load_symbol(params)
+        elif type_ == 'target':
+            coro = self._source.async_load_target_of(params)
+        elif type_ == 'source':
+            coro = self._source.async_load_source_of(params)
+
+        in_flight = self._start_in_flight(request, 'async_' + _LOAD_STAGES[type_][0])
+        handle = self._async.submit(coro, lambda cancelled: self._finish_in_flight(in_flight, cancelled))
+        in_flight['cancel'] = lambda: self._async.cancel(handle)
+
+    def _run_process(self, request):
+        """
+        Run compute_* with plain data in the process pool, or in this worker thread if there is none,
+        and apply the result
+        """
+        loadable, params, priority, key = request
+        name = {'symbol': 'compute_symbol', 'source': 'compute_source_of', 'target': 'compute_target_of'}[params['type']]
+        location = params['wrapper'].location
+        plain = {
+            'type': params['type'],
+            'location': SymbolLocation(location.filename, location.start_line, location.start_col, location.end_line, location.end_col),
+            'reference': params['reference'].name if 'reference' in params else None,
+            'requested_level': params['requested_level'],
+            'loaded_level': params['loaded_level'],
+            'offset': params.get('offset'),
+            'limit': params.get('limit')
+        }
+
+        if self._processes is None:
+            t = time.perf_counter() if STATS.enabled else None
+            try:
+                result = getattr(self._source, name)(plain)
+                if t is not None:
+                    STATS.record(name, time.perf_counter() - t)
+                self._apply_result(loadable, params, result)
+            finally:
+                self._reindex([params])
+                self._request_done(request)
+            return
+
+        def on_done(cancelled, result):
+            try:
+                if not cancelled:
+                    self._apply_result(loadable, params, result)
+            finally:
+                self._finish_in_flight(in_flight, cancelled)
+
+        in_flight = self._start_in_flight(request, name)
+        handle = self._processes.submit(name, plain, on_done)
+        in_flight['cancel'] = lambda: self._processes.cancel(handle)
+
+    def _apply_result(self, loadable, params, result):
+        """
+        Turn the plain result of compute_* into graph data, see Base.compute_symbol
+        """
         if params['type'] == 'symbol':
-            self._source.load_symbol(params)
-        elif params['type'] == 'target':
-            self._source.load_target_of(params)
-        elif params['type'] == 'source':
-            self._source.load_source_of(params)
+            symbol, location = result if result is not None else (None, None)
+            if location is not None:
+                wrapper = params['wrapper']
+                wrapper.location.start_line = location.start_line
+                wrapper.location.start_col = location.start_col
+                wrapper.location.end_line = location.end_line
+                wrapper.location.end_col = location.end_col
+            loadable.set(symbol, params['requested_level'])
+        elif params['requested_level'] == LOADABLE_COUNT:
+            loadable.set([], LOADABLE_COUNT, result)
+        elif params['requested_level'] == LOADABLE_PAGE:
+            loadable.set_page([self.create_wrapper(location) for location in result])
+        else:
+            loadable.set([self.create_wrapper(location) for location in result], params['requested_level'])
+
+    def _start_in_flight(self, request, stage):
+        """
+        stage names the latency recorded in STATS once the request has finished
+        """
+        in_flight = {'request': request, 'epoch': self._epoch, 'cancel': None,
+                     'stage': stage, 'started': time.perf_counter() if STATS.enabled else None}
+        with self._lock:
+            self._in_flight[id(request[0])] = in_flight
+        return in_flight
+
+    def _finish_in_flight(self, in_flight, cancelled):
+        loadable, params, priority, key = in_flight['request']
+        if in_flight['started'] is not None and not cancelled:
+            STATS.record(in_flight['stage'], time.perf_counter() - in_flight['started'])
+        with self._lock:
+            if self._in_flight.get(id(loadable)) is in_flight:
+                del self._in_flight[id(loadable)]
+
+            """
+            Batch notifications like JobQueue does
+            """
+            self._in_flight_skipped += 1
+            notify = len(self._in_flight) == 0 or self._in_flight_skipped > 100
+            if notify:
+                self._in_flight_skipped = 0
+
+        self._reindex([params])
+        if cancelled:
+            loadable.abort()
+        self._request_done(in_flight['request'])
+        if notify:
+            self._queue.notify()
+
+    def _cancel_in_flight(self, all_=False):
+        """
+        Cancel requests on the event loop or in the process pool which would be dropped from the queue (current
+        location and prefetch requests of older epochs), or all of them
+        """
+        with self._lock:
+            cancel = [f for f in self._in_flight.values() if all_ or
+                      (f['epoch'] < self._epoch and f['request'][2] in (PRIORITY_CURRENT, PRIORITY_PREFETCH))]
+
+        for f in cancel:
+            if f['cancel'] is not None:
+                f['cancel']()
+
+    def _on_queue_update(self):
+        self._notify_dirty()
+        if self._prefetcher is not None:
+            self._prefetcher.step()
+
+    def _notify_dirty(self):
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+
+        if len(dirty) > 0:
+            self._notify(dirty)
+
+    def on_extend(self, loadable, params):
+        """
+        A chunk has been streamed into loadable; notify right away instead of once the request has finished
+        """
+        with self._lock:
+            self._dirty.add(params['wrapper'])
+        self._queue.notify()
+
+    def on_set(self, loadable, params):
+        wrapper = params['wrapper']
+        with self._lock:
+            self._dirty.add(wrapper)
+            if params['type'] != 'symbol' and loadable.get() is not None:
+                for filename in set(w.location.filename for w in loadable.get()):
+                    self._referrers.setdefault(filename, WeakSet()).add(loadable)
+
+            if id(wrapper) in self._sizes:
+                size = wrapper.approx_size()
+                self._bytes += size - self._sizes[id(wrapper)]
+                self._sizes[id(wrapper)] = size
+
+        if self._cache is not None:
+            self._cache.store(loadable, params)
+
+    def _touch(self, wrapper):
+        if id(wrapper) in self._lru:
+            self._lru.move_to_end(id(wrapper))
+
+    def _add(self, wrapper):
+        self._data.add(wrapper)
+        self._lru[id(wrapper)] = wrapper
+        self._sizes[id(wrapper)] = wrapper.approx_size()
+        self._bytes += self._sizes[id(wrapper)]
+
+    def _is_pinned(self, wrapper):
+        return any(id(wrapper) in pinned for pinned in self._pinned.values())
+
+    def _over_capacity(self):
+        return ((self._max_wrappers > 0 and len(self._lru) > self._max_wrappers) or
+                (self._max_bytes > 0 and self._bytes > self._max_bytes))
+
+    def _evict(self):
+        if not self._over_capacity():
+            return
+
+        """
+        Wrappers which are pinned or loading are in use, so they are moved to the most recently used end instead of
+        being scanned again on every call. Each wrapper is looked at once at most.
+        """
+        skipped = 0
+        while self._over_capacity() and skipped < len(self._lru):
+            wrapper = next(iter(self._lru.values()))
+
+            if self._is_pinned(wrapper):
+                self.eviction_stats['skipped_pinned'] += 1
+                self._lru.move_to_end(id(wrapper))
+                skipped += 1
+                continue
+
+            if wrapper.is_loading():
+                self.eviction_stats['skipped_loading'] += 1
+                self._lru.move_to_end(id(wrapper))
+                skipped += 1
+                continue
+
+            self._remove(wrapper)
+            wrapper.reset()
 
+            self.eviction_stats['evicted'] += 1
+
+    def _remove(self, wrapper):
+        """
+        Requires self._lock
+        """
+        if self._data.remove(wrapper):
+            self._lru.pop(id(wrapper), None)
+            self._bytes -= self._sizes.pop(id(wrapper), 0)
+
+            """
+            The outline might refer to wrapper, so it is not complete anymore
+            """
+            if self._outlines.get(wrapper.location.filename) is not None:
+                del self._outlines[wrapper.location.filename]
+
+    def _refresh_referrers(self, referrers):
+        """
+        Reference lists which point into a changed file: reload displayed ones, drop the others
+        """
+        for loadable in referrers:
+            wrapper = loadable.params()['wrapper']
+            with self._lock:
+                pinned = self._is_pinned(wrapper)
+
+            if pinned or loadable.is_loading():
+                loadable.refresh()
+            else:
+                loadable.reset()
+
+    def invalidate_lines(self, filename, first, last, delta):
+        """
+        Lines first...last (numbered after the change) of filename have been changed, while the number
+        of lines changed by delta. Wrappers overlapping the change are dropped, wrappers below are moved
+        by delta, wrappers above are kept. Reference lists pointing into the file are reloaded.
+        """
+        old_last = last - delta
+        dropped = []
+        moved = []
+
+        with self._lock:
+            for wrapper in self._data.in_file(filename):
+                location = wrapper.location
+                end_line = location.end_line if location.end_line != -1 else float('inf')
+
+                if old_last >= first:
+                    overlaps = location.start_line <= old_last and end_line >= first
+                    below = location.start_line > old_last
+                else:
+                    """
+                    Lines have only been inserted before line first
+                    """
+                    overlaps = location.start_line < first and end_line >= first
+                    below = location.start_line >= first
+
+                if overlaps:
+                    self._remove(wrapper)
+                    dropped += [wrapper]
+                elif below and delta != 0:
+                    location.start_line += delta
+                    if location.end_line != -1:
+                        location.end_line += delta
+                    self._data.reindex(wrapper)
+                    moved += [wrapper]
+
+            referrers = list(self._referrers.pop(filename, []))
+            self._outlines.pop(filename, None)
+
+        for wrapper in dropped:
+            if not wrapper.is_loading():
+                wrapper.reset()
+
+        self._refresh_referrers(referrers)
+        self._notify(set(dropped + moved + [loadable.params()['wrapper'] for loadable in referrers] + [('outline', filename)]))
+
+    def invalidate_file(self, filename):
+        """
+        filename has been written: reload everything loaded for wrappers within it and all reference lists pointing into it
+        """
+        with self._lock:
+            wrappers = self._data.in_file(filename)
+            referrers = list(self._referrers.pop(filename, []))
+            self._outlines.pop(filename, None)
+
+        self._refresh_referrers(referrers + [loadable for w in wrappers for loadable in w.loadables() if loadable.is_loaded() or loadable.is_loading()])
+        self._notify(set(wrappers + [loadable.params()['wrapper'] for loadable in referrers] + [('outline', filename)]))
+
+    def pin(self, key, wrappers):
+        """
+        Protect wrappers from eviction until pin is called again with the same key or unpin(key)
+        """
+        with self._lock:
+            self._pinned[key] = {id(w): w for w in wrappers}
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.pop(key, None)
+
+    def pin_neighbourhood(self, key, wrapper):
+        """
+        Pin wrapper together with all wrappers displayed along with it, returns these wrappers
+        """
+        if wrapper is None:
+            self.unpin(key)
+            return []
+        else:
+            wrappers = [wrapper] + list(wrapper.neighbours())
+            self.pin(key, wrappers)
+            return wrappers
+
+    def outline(self, filename):
+        """
+        Wrappers of all symbols in filename sorted by location, if the source implements load_file. Loaded on
+        first call, returns None until then.
+        """
+        if not self._source.supports_file():
+            return None
+
+        with self._lock:
+            if filename in self._outlines:
+                return self._outlines[filename]
+            self._outlines[filename] = None
+
+        self._queue.job(lambda: self._load_file(filename), PRIORITY_PREVIEW)
+        return None
+
+    def _load_file(self, filename):
+        def key(entry):
+            location = entry[0]
+            end_line = location.end_line if location.end_line != -1 else float('inf')
+            end_col = location.end_col if location.end_col != -1 else float('inf')
+            return (location.start_line, location.start_col, -end_line, -end_col)
+
+        """
+        Symbols are stored in the cache like those loaded by load_symbol
+        """
+        stamp = self._cache.stamp(filename) if self._cache is not None else None
+        entries = sorted(self._source.load_file(filename), key=key)
+
+        """
+        Lookups return the containing wrapper inserted first, so inner symbols, which come later, are inserted first
+        """
+        wrappers = []
+        for location, symbol in reversed(entries):
+            wrapper = self._outline_wrapper(location)
+            if not wrapper.symbol.is_loaded() and not wrapper.symbol.is_loading():
+                params = wrapper.symbol.params()
+                params['cache_stamp'] = stamp
+                wrapper.symbol.set(symbol)
+                params.pop('cache_stamp', None)
+            wrappers += [wrapper]
+        wrappers.reverse()
+
+        with self._lock:
+            """
+            Unless invalidated in the meantime
+            """
+            if filename in self._outlines:
+                self._outlines[filename] = wrappers
+                self._dirty.add(('outline', filename))
+
+    def _outline_wrapper(self, location):
+        """
+        Wrapper at exactly location, unlike create_wrapper also if it overlaps others
+        """
+        with self._lock:
+            for w in self._data.in_lines(location.filename, location.start_line, location.start_line):
+                other = w.location
+                if (other.start_col, other.end_line, other.end_col) == (location.start_col, location.end_line, location.end_col):
+                    self._touch(w)
+                    return w
+
+            wrapper = _SymbolWrapper(self, SymbolLocation(location.filename, location.start_line, location.start_col, location.end_line, location.end_col))
+            self._add(wrapper)
+            return wrapper
+
+    def traverse(self, root, reference, direction, max_depth, max_fanout, order=TRAVERSE_BFS, level=None, toggled=()):
+        """
+        Tree of wrappers reachable from root, see nvimbols.traversal.traverse. Returns (root TreeNode, complete)
+        """
+        return traverse(root, reference, direction, max_depth, max_fanout, order, level, toggled)
 
     def create_wrapper(self, location):
-        for w in self._data:
-            if w.location.contains(location) or location.contains(w.location):
+        with self._lock:
+            w = self._data.find_overlapping(location)
+            if w is not None:
                 return w
 
-        location = SymbolLocation(location.filename, location.start_line, location.start_col, location.end_line, location.end_col)
-        wrapper = _SymbolWrapper(self, location)
+            location = SymbolLocation(location.filename, location.start_line, location.start_col, location.end_line, location.end_col)
+            wrapper = _SymbolWrapper(self, location)
 
-        self._data += [wrapper]
-        return wrapper
+            self._add(wrapper)
+            return wrapper
 
     def get(self, location):
-        for wrapper in self._data:
-            if(wrapper.location.contains(location)):
-                return wrapper
+        if location is None:
+            return None
 
-        return None
+        with self._lock:
+            wrapper = self._data.find_containing(location)
+            if wrapper is not None:
+                self._touch(wrapper)
+            return wrapper
 
     def clear(self):
-        self._queue.cancel()
-        self._data = []
+        self.cancel()
+        if self._cache is not None:
+            self._cache.clear()
+        with self._lock:
+            self._data.clear()
+            self._referrers = {}
+            self._outlines = {}
+            self._pinned_outline = None
+            self._pinned.pop('outline', None)
+            self._lru = OrderedDict()
+            self._sizes = {}
+            self._bytes = 0
 
     def require_at_location(self, location):
-        wrapper = self.get(location)
-        if(wrapper is None):
+        """
+        Make location the current one. The first time a file is visited, its symbols are read from the cache in
+        a job first, which then continues here unless the location has changed meanwhile.
+        """
+        with self._require_lock:
+            self._required = location
+            if self._cache is not None and not self._cache.is_warm(location.filename):
+                self._queue.job(lambda: self._warm(location), PRIORITY_CURRENT)
+                return
+
+            self._require(location)
+
+    def _warm(self, location):
+        self._cache.warm(self, location.filename)
+        with self._require_lock:
+            if self._required is location:
+                self._require(location)
+
+    def _require(self, location):
+        """
+        Requires self._require_lock
+        """
+        t = time.perf_counter() if STATS.enabled else None
+
+        outline = self.outline(location.filename)
+
+        """
+        Older wrappers, e.g. created for a reference, might contain location as well; once the outline is there,
+        the (innermost, as inserted first) outline symbol is taken, which is loaded already
+        """
+        wrapper = None
+        with self._lock:
+            if outline is not self._pinned_outline:
+                self._pinned_outline = outline
+                self._pinned['outline'] = {id(w): w for w in outline or []}
+            members = self._pinned.get('outline', {})
+
+            if outline is not None:
+                wrapper = self._data.find_containing(location, lambda w: id(w) in members)
+                if wrapper is not None:
+                    self._touch(wrapper)
+
+        if wrapper is None:
+            wrapper = self.get(location)
+        if wrapper is None:
             wrapper = self.create_wrapper(location)
+        if outline is not None and id(wrapper) not in members and \
+                not wrapper.symbol.is_loaded() and not wrapper.symbol.is_loading():
+            """
+            The outline contains all symbols of the file, so there is none here
+            """
+            wrapper.symbol.set(None)
+
+        with self._lock:
+            self._current = wrapper
+            self._pinned['location'] = {id(wrapper): wrapper}
+            self._evict()
+
+        self._epoch += 1
+        self._queue.set_epoch(self._epoch)
+        self._cancel_in_flight()
+
+        """
+        If the symbol is still waiting in the queue from an earlier visit, move it to the front
+        """
+        if not self._promote(wrapper.symbol):
+            wrapper.symbol.request()
 
-        wrapper.symbol.request()
+        if t is not None:
+            STATS.record('lookup', time.perf_counter() - t)
 
 
 
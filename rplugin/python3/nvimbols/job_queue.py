@@ -1,13 +1,33 @@
-from threading import Thread, Lock
+import heapq
+import time
+from threading import Thread, Lock, Condition
 
 from nvimbols.observable import Observable
 from nvimbols.util import on_error, log
+from nvimbols.stats import STATS
+
+
+"""
+Indices into a queue entry
+"""
+_STALE = 0
+_PRIORITY = 1
+_SEQ = 2
+_JOB = 3
+_EPOCH = 4
+_ON_DROP = 5
+_QUEUED_AT = 6
 
 
 class JobQueue(Observable):
-    def __init__(self, tasks=1, vim=None, threadsafe=False):
+    def __init__(self, tasks=1, vim=None, threadsafe=False, name=None):
         super().__init__()
 
+        """
+        If given, waiting times are recorded in STATS as stage name_wait
+        """
+        self._wait_stage = "%s_wait" % name if name is not None else None
+
         self._tasks = tasks
         self._vim = vim
         self._threadsafe = threadsafe
@@ -15,56 +35,228 @@ class JobQueue(Observable):
             self._tasks = 1
 
         self._lock = Lock()
+        self._has_jobs = Condition(self._lock)
+
+        """
+        Long-lived worker threads and a single thread passing on notifications, started on first use
+        """
+        self._workers = []
+        self._notifier = None
+        self._notify_pending = Condition(Lock())
+        self._notify_requested = False
+
+        """
+        Heap of entries [stale, priority, seq, job, epoch, on_drop, queued_at]; lower priority values run first,
+        jobs of older epochs run after all jobs of the current epoch. Removed entries stay in the heap with job None.
+        """
         self._jobs = []
+        self._size = 0
+        self._seq = 0
+        self._epoch = 0
         self._running_jobs = 0
 
         self._skipped_notifications = 0
 
+        """
+        priority -> counters
+        """
+        self._stats = {}
+
     def is_empty(self):
         """
         Returns True if there are no jobs waiting. However, there might be some working
         """
         with self._lock:
-            return len(self._jobs) == 0
+            return self._size == 0
 
     def is_done(self):
         """
         Returns True if there are no jobs waiting and jobs executing
         """
         with self._lock:
-            return len(self._jobs) == 0 and self._running_jobs == 0
+            return self._size == 0 and self._running_jobs == 0
+
+    def _priority_stats(self, priority):
+        if priority not in self._stats:
+            self._stats[priority] = {
+                'queued': 0,
+                'dispatched': 0,
+                'dropped': 0,
+                'wait_total': 0.,
+                'wait_max': 0.
+            }
+        return self._stats[priority]
 
-    def job(self, job):
+    def stats(self):
+        """
+        Per priority: number of jobs waiting, number of jobs dispatched and dropped, and time spent waiting in seconds
+        """
         with self._lock:
-            self._jobs += [job]
+            return {p: dict(self._stats[p]) for p in self._stats}
+
+    def job(self, job, priority=0, epoch=None, on_drop=None):
+        """
+        Queue job. Jobs of an epoch older than the current one (see set_epoch) are run after all others,
+        or dropped if on_drop is given, in which case on_drop is called instead.
+
+        Returns a handle to be passed to promote
+        """
+        with self._lock:
+            entry = self._push(job, priority, self._epoch if epoch is None else epoch, on_drop)
 
         self._dispatch()
+        return entry
+
+    def _push(self, job, priority, epoch, on_drop):
+        self._seq += 1
+        entry = [epoch < self._epoch, priority, self._seq, job, epoch, on_drop, time.time()]
+        heapq.heappush(self._jobs, entry)
+        self._size += 1
+        self._priority_stats(priority)['queued'] += 1
+        return entry
+
+    def _remove(self, entry):
+        if entry[_JOB] is None:
+            return False
+
+        entry[_JOB] = None
+        self._size -= 1
+        self._priority_stats(entry[_PRIORITY])['queued'] -= 1
+        return True
+
+    def promote(self, entry, priority, epoch=None):
+        """
+        Move a queued job to the given priority and the current (or given) epoch. Returns the new handle,
+        or None if the job is not waiting anymore.
+        """
+        with self._lock:
+            job, on_drop = entry[_JOB], entry[_ON_DROP]
+            if not self._remove(entry):
+                return None
+            return self._push(job, priority, self._epoch if epoch is None else epoch, on_drop)
+
+    def is_stale(self, entry):
+        """
+        True if the job is still waiting, but behind those of the current epoch
+        """
+        with self._lock:
+            return entry[_JOB] is not None and entry[_EPOCH] < self._epoch
+
+    def set_epoch(self, epoch):
+        """
+        Start a new epoch: all waiting jobs of older epochs are dropped or moved behind the current ones
+        """
+        dropped = []
+        with self._lock:
+            self._epoch = epoch
+            for entry in self._jobs:
+                if entry[_JOB] is None:
+                    continue
+
+                if entry[_EPOCH] < epoch:
+                    if entry[_ON_DROP] is not None:
+                        dropped += [entry[_ON_DROP]]
+                        self._priority_stats(entry[_PRIORITY])['dropped'] += 1
+                        self._remove(entry)
+                    else:
+                        entry[_STALE] = True
+                else:
+                    entry[_STALE] = False
+
+            self._jobs = [e for e in self._jobs if e[_JOB] is not None]
+            heapq.heapify(self._jobs)
+
+        for on_drop in dropped:
+            try:
+                on_drop()
+            except Exception as err:
+                on_error(self._vim, err)
 
     def cancel(self):
         with self._lock:
+            for entry in self._jobs:
+                self._remove(entry)
             self._jobs = []
 
+    def _pop(self):
+        """
+        Requires self._lock
+        """
+        while len(self._jobs) > 0:
+            entry = heapq.heappop(self._jobs)
+            job = entry[_JOB]
+            if job is None:
+                continue
+
+            self._remove(entry)
+
+            stats = self._priority_stats(entry[_PRIORITY])
+            wait = time.time() - entry[_QUEUED_AT]
+            stats['dispatched'] += 1
+            stats['wait_total'] += wait
+            stats['wait_max'] = max(stats['wait_max'], wait)
+            if self._wait_stage is not None and STATS.enabled:
+                STATS.record(self._wait_stage, wait)
+            return job
+
+        return None
+
     def _next_job(self):
         with self._lock:
-            if len(self._jobs) == 0:
-                return None
-            else:
-                job = self._jobs[0]
-                del self._jobs[0]
-                return job
+            return self._pop()
 
     def _dispatch(self):
         if self.is_empty():
             return
 
         with self._lock:
-            while self._running_jobs < self._tasks:
-                if self._threadsafe:
+            if self._threadsafe:
+                while self._running_jobs < self._tasks:
                     self._vim.session.threadsafe_call(lambda: self._action())
-                else:
-                    Thread(target=lambda: self._action()).start()
+                    self._running_jobs += 1
+            else:
+                while len(self._workers) < self._tasks:
+                    worker = Thread(target=lambda: self._work(), daemon=True)
+                    self._workers += [worker]
+                    worker.start()
+                self._has_jobs.notify(self._size)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while self._size == 0:
+                    self._has_jobs.wait()
+                job = self._pop()
                 self._running_jobs += 1
 
+            self._run(job)
+
+    def _notify_loop(self):
+        while True:
+            with self._notify_pending:
+                while not self._notify_requested:
+                    self._notify_pending.wait()
+                self._notify_requested = False
+
+            self._notify()
+
+    def _request_notify(self):
+        """
+        Notifications requested while the notifier is busy are coalesced into one
+        """
+        with self._notify_pending:
+            if self._notifier is None:
+                self._notifier = Thread(target=lambda: self._notify_loop(), daemon=True)
+                self._notifier.start()
+            self._notify_requested = True
+            self._notify_pending.notify()
+
+    def notify(self):
+        """
+        Notify observers from the notifier thread, e.g. for work finished outside of the queue
+        """
+        self._request_notify()
+
     def _on_task_finished(self):
         with self._lock:
             if self._running_jobs < 1:
@@ -73,24 +265,26 @@ class JobQueue(Observable):
 
             def do_notify():
                 self._skipped_notifications = 0
-                Thread(target=lambda: self._notify()).start()
+                self._request_notify()
 
             """
             Batch notifications according to simple heuristics
             """
-            if len(self._jobs) == 0 and self._running_jobs == 0:
+            if self._size == 0 and self._running_jobs == 0:
                 do_notify()
             elif self._skipped_notifications > 100:
                 do_notify()
             else:
                 self._skipped_notifications += 1
 
-        self._dispatch()
+        if self._threadsafe:
+            self._dispatch()
 
     def _action(self):
-        try:
-            job = self._next_job()
+        self._run(self._next_job())
 
+    def _run(self, job):
+        try:
             if job is not None:
                 repeat = job() is not None
 
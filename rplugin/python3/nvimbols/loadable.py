@@ -1,8 +1,30 @@
+from threading import Lock
+
 LOADABLE_PREVIEW = 'preview'
 LOADABLE_FULL = 'full'
 
+"""
+Optional levels for reference lists: only the number of entries, and the entries params['offset'] to
+params['offset'] + params['limit']
+"""
+LOADABLE_COUNT = 'count'
+LOADABLE_PAGE = 'page'
+
+"""
+State transitions of a Loadable happen under one of these locks, picked by id, so Loadables do not need a lock each.
+The graph is only called once the lock has been released.
+"""
+_SHARDS = [Lock() for _ in range(64)]
+
+
 class Loadable:
-    def __init__(self, graph, params):
+    """
+    Slotted, as there are several per wrapper; __weakref__ for SymbolsGraph._referrers
+    """
+    __slots__ = ('_graph', '_data', '_params', '_loaded_level', 'levels', 'page_size', 'total', '_partial', '_state',
+                 '_request_again_when_done', '_refresh_when_done', 'version', '__weakref__')
+
+    def __init__(self, graph, params, levels=None, page_size=100):
         self._graph = graph
         self._data = None
         self._params = params
@@ -12,10 +34,27 @@ class Loadable:
         """
         levels[i] includes levels[i-1]
         """
-        self.levels = [LOADABLE_PREVIEW, LOADABLE_FULL]
+        self.levels = levels if levels is not None else [LOADABLE_PREVIEW, LOADABLE_FULL]
+        self.page_size = page_size
+
+        """
+        Number of entries of the complete list, if known without loading all of them
+        """
+        self.total = None
+
+        """
+        Chunks passed to extend while loading
+        """
+        self._partial = None
 
         self._state = 'initial'
         self._request_again_when_done = None
+        self._refresh_when_done = False
+
+        """
+        Incremented whenever data or state change in a way that affects rendering
+        """
+        self.version = 0
 
     def _compare_levels(self, level1, level2):
         i1 = self.levels.index(level1) if level1 is not None else -1
@@ -26,6 +65,26 @@ class Loadable:
     def get(self):
         return self._data
 
+    def get_partial(self, limit=None, start=0):
+        """
+        Copy of (entries start... limit-1 of) the data streamed in by extend so far while loading, None if there
+        is none. extend appends in place, so the list itself is never handed out.
+        """
+        with self._lock():
+            if self._partial is None:
+                return None
+            return self._partial[start:limit]
+
+    def partial_length(self):
+        with self._lock():
+            return len(self._partial) if self._partial is not None else 0
+
+    def params(self):
+        return self._params
+
+    def loaded_level(self):
+        return self._loaded_level
+
     def is_loading(self):
         return self._state == 'requested'
 
@@ -38,39 +97,178 @@ class Loadable:
         """
         return self._compare_levels(self._loaded_level, level) >= 0
 
-    def _request(self, level):
+    def _lock(self):
+        return _SHARDS[(id(self) >> 4) % len(_SHARDS)]
+
+    def _begin_request(self, level, offset=0, limit=None):
+        """
+        Requires self._lock(). The caller passes the request on to the graph afterwards.
+        """
         self._state = 'requested'
         self._params['requested_level'] = level
         self._params['loaded_level'] = self._loaded_level
+        if level == LOADABLE_PAGE:
+            """
+            Unless asked for more, (re)load all pages loaded so far
+            """
+            loaded = len(self._data) if self._loaded_level == LOADABLE_PAGE and self._data is not None else 0
+            self._params['offset'] = offset
+            self._params['limit'] = limit if limit is not None else max(self.page_size, loaded)
+
+    def request_more(self, count=None):
+        """
+        Load the next count (defaults to page_size) entries of a list loaded at LOADABLE_PAGE
+        """
+        with self._lock():
+            if self._state != 'loaded' or self._loaded_level != LOADABLE_PAGE:
+                return
+            self._begin_request(LOADABLE_PAGE, len(self._data), count if count is not None else self.page_size)
+
         self._graph.on_request(self, self._params)
 
     def request(self, level=None):
         if(level is None):
             level = self.levels[-1]
 
-        if(self._state == 'initial'):
-            self._request(level)
+        with self._lock():
+            if(self._state == 'initial'):
+                self._begin_request(level)
 
-        elif self._state == 'requested':
-            self._request_again_when_done = level
+            elif self._state == 'requested':
+                if(self._compare_levels(self._params['requested_level'], level) < 0):
+                    self._request_again_when_done = level
+                return
 
-        elif self._state == 'loaded':
-            if(self._compare_levels(self._loaded_level, level) < 0):
-                self._request(level)
+            elif self._state == 'loaded':
+                if(self._compare_levels(self._loaded_level, level) >= 0):
+                    return
+                self._begin_request(level)
 
-    def set(self, data, level=None):
-        if(level is None):
-            level = self.levels[-1]
+        self._graph.on_request(self, self._params)
 
-        self._data = data
-        self._state = 'loaded'
-        self._loaded_level = level
+    def abort(self):
+        """
+        Called if a request has been dropped before being processed
+        """
+        with self._lock():
+            if self._state != 'requested':
+                return
 
-        if self._request_again_when_done:
-            tmp = self._request_again_when_done
+            self._state = 'loaded' if self._loaded_level is not None else 'initial'
+            self._partial = None
+            self._refresh_when_done = False
+            self.version += 1
+
+            again = self._request_again_when_done
             self._request_again_when_done = None
-            self.request(tmp)
 
+        if again:
+            self.request(again)
+
+    def refresh(self):
+        """
+        Load again at the current level, e.g. because the underlying file changed. Loaded data
+        stays available until replaced.
+        """
+        with self._lock():
+            if self._state == 'requested':
+                self._refresh_when_done = True
+                return
+            if self._state != 'loaded':
+                return
+            self._begin_request(self._loaded_level)
+
+        self._graph.on_request(self, self._params)
+
+    def reset(self):
+        """
+        Return to the initial state, dropping loaded data. Does nothing while loading, as the result
+        would be set anyway.
+        """
+        with self._lock():
+            if self._state == 'requested':
+                return
+
+            self._data = None
+            self._partial = None
+            self.total = None
+            self._state = 'initial'
+            self._loaded_level = None
+            self._request_again_when_done = None
+            self._refresh_when_done = False
+            self.version += 1
+
+    def extend(self, data, done=False, level=None):
+        """
+        Streaming alternative to set for lists: data is appended to the partial result, which is available
+        through get_partial while loading. The last chunk (possibly empty) is passed with done=True,
+        which sets all chunks at level like set does.
+        """
+        with self._lock():
+            if self._partial is None:
+                self._partial = []
+            self._partial += data
+            partial = self._partial
+            if not done:
+                self.version += 1
+
+        if done:
+            self.set(partial, level)
+        else:
+            self._graph.on_extend(self, self._params)
+
+    def set_page(self, data, total=None):
+        """
+        Set the entries loaded for a LOADABLE_PAGE request (params['offset'] onwards). The level becomes
+        the last one once all total entries are there.
+        """
+        with self._lock():
+            previous = self._data[:self._params['offset']] if self._data is not None else []
+            total = total if total is not None else self.total
+        data = previous + data
+
+        if total is not None and len(data) >= total:
+            self.set(data, self.levels[-1], total)
+        else:
+            self.set(data, LOADABLE_PAGE, total)
+
+    def set(self, data, level=None, total=None):
+        """
+        total is the number of entries of the complete list, see LOADABLE_COUNT and LOADABLE_PAGE
+        """
+        if(level is None):
+            level = self.levels[-1]
+
+        """
+        A pending refresh is started right away, so there is no window in which the Loadable looks loaded
+        and idle; a request for a higher level is made through request once the graph has been told.
+        """
+        restarted = False
+        again = None
+        with self._lock():
+            if total is not None:
+                self.total = total
+            elif level == self.levels[-1] and isinstance(data, list):
+                self.total = len(data)
+
+            self._data = data
+            self._partial = None
+            self._state = 'loaded'
+            self._loaded_level = level
+            self.version += 1
 
+            if self._refresh_when_done:
+                self._refresh_when_done = False
+                self._begin_request(self._request_again_when_done or level)
+                self._request_again_when_done = None
+                restarted = True
+            else:
+                again = self._request_again_when_done
+                self._request_again_when_done = None
 
+        self._graph.on_set(self, self._params)
 
+        if restarted:
+            self._graph.on_request(self, self._params)
+        elif again:
+            self.request(again)
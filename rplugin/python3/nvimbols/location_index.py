@@ -0,0 +1,356 @@
+from bisect import bisect_left, bisect_right
+from random import random
+
+
+def _end_key(location):
+    """
+    End of location as the containing one: -1 (up to the end of the file or line) compares after anything
+    """
+    return (location.end_line if location.end_line != -1 else float('inf'),
+            location.end_col if location.end_col != -1 else float('inf'))
+
+
+class _Span:
+    """
+    Node of _Spans. end is the end of the wrapper as a containing location (see _end_key), raw_end its end as a
+    contained one; max_end and min_raw_end cover the whole subtree.
+    """
+    __slots__ = ('key', 'end', 'raw_end', 'wrapper', 'priority', 'left', 'right', 'max_end', 'min_raw_end')
+
+    def __init__(self, key, location, wrapper):
+        self.key = key
+        self.end = _end_key(location)
+        self.raw_end = (location.end_line, location.end_col)
+        self.wrapper = wrapper
+        self.priority = random()
+        self.left = None
+        self.right = None
+        self.max_end = self.end
+        self.min_raw_end = self.raw_end
+
+    def update(self):
+        self.max_end = self.end
+        self.min_raw_end = self.raw_end
+        for child in (self.left, self.right):
+            if child is not None:
+                if child.max_end > self.max_end:
+                    self.max_end = child.max_end
+                if child.min_raw_end < self.min_raw_end:
+                    self.min_raw_end = child.min_raw_end
+
+
+class _Spans:
+    """
+    Interval tree of multi-line wrappers: a treap ordered by (start_line, start_col, seq), where every node knows
+    the largest and smallest end in its subtree. Finding all spans containing (or contained in) a location takes
+    O(log n) per span found, instead of looking at every span starting before it.
+    """
+    def __init__(self):
+        self._root = None
+
+    def insert(self, key, location, wrapper):
+        node = _Span(key, location, wrapper)
+        left, right = self._split(self._root, key)
+        self._root = self._merge(self._merge(left, node), right)
+
+    def remove(self, key):
+        self._root = self._remove(self._root, key)
+
+    def _split(self, node, key):
+        """
+        Nodes with keys < key, nodes with keys >= key
+        """
+        if node is None:
+            return None, None
+        if node.key < key:
+            left, right = self._split(node.right, key)
+            node.right = left
+            node.update()
+            return node, right
+        else:
+            left, right = self._split(node.left, key)
+            node.left = right
+            node.update()
+            return left, node
+
+    def _merge(self, left, right):
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.update()
+            return left
+        else:
+            right.left = self._merge(left, right.left)
+            right.update()
+            return right
+
+    def _remove(self, node, key):
+        if node is None:
+            return None
+        if key < node.key:
+            node.left = self._remove(node.left, key)
+        elif node.key < key:
+            node.right = self._remove(node.right, key)
+        else:
+            return self._merge(node.left, node.right)
+        node.update()
+        return node
+
+    def containing(self, location):
+        """
+        (key, wrapper) of all spans starting at or before location and ending at or after it
+        """
+        start = (location.start_line, location.start_col, float('inf'))
+        end = (location.end_line, location.end_col)
+
+        stack = [self._root] if self._root is not None else []
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.max_end < end:
+                continue
+
+            if node.left is not None:
+                stack.append(node.left)
+            if node.key <= start:
+                if node.end >= end:
+                    yield node.key, node.wrapper
+                if node.right is not None:
+                    stack.append(node.right)
+
+    def contained(self, location):
+        """
+        (key, wrapper) of all spans starting at or after location and ending at or before it
+        """
+        start = (location.start_line, location.start_col)
+        end = _end_key(location)
+
+        stack = [self._root] if self._root is not None else []
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.min_raw_end > end:
+                continue
+
+            if node.right is not None:
+                stack.append(node.right)
+            if node.key >= start:
+                if node.raw_end <= end:
+                    yield node.key, node.wrapper
+                if node.left is not None:
+                    stack.append(node.left)
+
+
+class _FileIndex:
+    def __init__(self):
+        """
+        Wrappers spanning a single line, sorted by (start_line, start_col, seq)
+        """
+        self.single_keys = []
+        self.single = []
+
+        """
+        Wrappers spanning multiple lines (or up to the end of the file, end_line == -1), same ordering, and
+        again in an interval tree. Sources extend wrapper.location over the whole symbol (see Base.load_symbol),
+        so there are as many of these as there are functions and classes visited.
+        """
+        self.multi_keys = []
+        self.multi = []
+        self.spans = _Spans()
+
+    def is_empty(self):
+        return len(self.single) == 0 and len(self.multi) == 0
+
+
+class LocationIndex:
+    """
+    Per-file index of _SymbolWrapper locations.
+
+    Replaces the linear scan over all wrappers with bisection on sorted start positions. Among
+    several matching wrappers the one inserted first is returned, same as scanning a list in
+    insertion order.
+
+    The index stores the location a wrapper has been inserted with. If a source changes
+    wrapper.location afterwards, reindex(wrapper) needs to be called.
+
+    Lookups take O(log n) plus the number of wrappers on the line (single-line wrappers) or matching
+    (multi-line wrappers, see _Spans).
+    """
+    def __init__(self):
+        self._files = {}
+        self._keys = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        for f in self._files.values():
+            yield from f.single
+            yield from f.multi
+
+    def in_file(self, filename):
+        file_index = self._files.get(filename)
+        if file_index is None:
+            return []
+        return file_index.single + file_index.multi
+
+    def in_lines(self, filename, first, last):
+        """
+        All wrappers of filename starting within lines first...last
+        """
+        file_index = self._files.get(filename)
+        if file_index is None:
+            return []
+
+        result = []
+        for keys, wrappers in ((file_index.single_keys, file_index.single), (file_index.multi_keys, file_index.multi)):
+            lo = bisect_left(keys, (first, ))
+            hi = bisect_right(keys, (last, float('inf')))
+            result += wrappers[lo:hi]
+        return result
+
+    def _lists(self, file_index, location):
+        if location.start_line == location.end_line:
+            return file_index.single_keys, file_index.single
+        else:
+            return file_index.multi_keys, file_index.multi
+
+    def add(self, wrapper):
+        self._seq += 1
+        self._insert(wrapper, self._seq)
+
+    def _insert(self, wrapper, seq):
+        location = wrapper.location
+        file_index = self._files.get(location.filename)
+        if file_index is None:
+            file_index = _FileIndex()
+            self._files[location.filename] = file_index
+
+        key = (location.start_line, location.start_col, seq)
+        keys, wrappers = self._lists(file_index, location)
+        i = bisect_left(keys, key)
+        keys.insert(i, key)
+        wrappers.insert(i, wrapper)
+
+        single = location.start_line == location.end_line
+        if not single:
+            file_index.spans.insert(key, location, wrapper)
+
+        self._keys[id(wrapper)] = (location.filename, single, key, (location.end_line, location.end_col))
+
+    def remove(self, wrapper):
+        entry = self._keys.pop(id(wrapper), None)
+        if entry is None:
+            return False
+
+        filename, single, key, end = entry
+        file_index = self._files[filename]
+        keys, wrappers = (file_index.single_keys, file_index.single) if single else (file_index.multi_keys, file_index.multi)
+
+        i = bisect_left(keys, key)
+        del keys[i]
+        del wrappers[i]
+        if not single:
+            file_index.spans.remove(key)
+
+        if file_index.is_empty():
+            del self._files[filename]
+
+        return True
+
+    def reindex(self, wrapper):
+        """
+        Move wrapper to the position corresponding to its current location, keeping its insertion order
+        """
+        entry = self._keys.get(id(wrapper))
+        if entry is None:
+            return
+
+        filename, single, key, end = entry
+        location = wrapper.location
+        if (filename == location.filename and
+                key[:2] == (location.start_line, location.start_col) and
+                end == (location.end_line, location.end_col)):
+            return
+
+        self.remove(wrapper)
+        self._insert(wrapper, key[2])
+
+    def clear(self):
+        self._files = {}
+        self._keys = {}
+
+    def _best(self, current, keys, wrappers, i):
+        if current is None or keys[i][2] < current[0]:
+            return keys[i][2], wrappers[i]
+        return current
+
+    def find_containing(self, location, accept=None):
+        """
+        First wrapper w (in insertion order) with w.location.contains(location), and accept(w) if given
+        """
+        file_index = self._files.get(location.filename)
+        if file_index is None:
+            return None
+
+        best = None
+
+        """
+        Single-line wrappers can only contain locations on their own line starting at or after their start.
+        Degenerate locations (end_line == -1) compare as ending before any line.
+        """
+        lo = None
+        if location.start_line == location.end_line:
+            lo = bisect_left(file_index.single_keys, (location.start_line, ))
+        elif location.end_line < location.start_line:
+            lo = 0
+
+        if lo is not None:
+            keys, wrappers = file_index.single_keys, file_index.single
+            hi = bisect_right(keys, (location.start_line, location.start_col, float('inf')))
+            for i in range(lo, hi):
+                if wrappers[i].location.contains(location) and (accept is None or accept(wrappers[i])):
+                    best = self._best(best, keys, wrappers, i)
+
+        for key, wrapper in file_index.spans.containing(location):
+            if (best is None or key[2] < best[0]) and wrapper.location.contains(location) and (accept is None or accept(wrapper)):
+                best = (key[2], wrapper)
+
+        return best[1] if best is not None else None
+
+    def find_overlapping(self, location):
+        """
+        First wrapper w (in insertion order) with w.location.contains(location) or location.contains(w.location)
+        """
+        file_index = self._files.get(location.filename)
+        if file_index is None:
+            return None
+
+        best = None
+        containing = self.find_containing(location)
+        if containing is not None:
+            best = (self._keys[id(containing)][2][2], containing)
+
+        """
+        Single-line wrappers contained in location start within location
+        """
+        keys, wrappers = file_index.single_keys, file_index.single
+        lo = bisect_left(keys, (location.start_line, location.start_col))
+        hi = bisect_right(keys, (float('inf'), ) if location.end_line == -1 else (location.end_line, float('inf')))
+        for i in range(lo, hi):
+            if best is not None and keys[i][2] > best[0]:
+                continue
+            if location.contains(wrappers[i].location):
+                best = self._best(best, keys, wrappers, i)
+
+        """
+        Multi-line wrappers with end_line == -1 compare as ending before any line, so these are not bounded by
+        the end of location; the interval tree covers them as well
+        """
+        for key, wrapper in file_index.spans.contained(location):
+            if (best is None or key[2] < best[0]) and location.contains(wrapper.location):
+                best = (key[2], wrapper)
+
+        return best[1] if best is not None else None
@@ -0,0 +1,139 @@
+import os
+import time
+from collections import deque
+from threading import Thread, Lock, Condition
+
+
+LOG_DEBUG = 'debug'
+LOG_INFO = 'info'
+LOG_WARNING = 'warning'
+LOG_ERROR = 'error'
+
+_LEVELS = [LOG_DEBUG, LOG_INFO, LOG_WARNING, LOG_ERROR]
+
+
+class Logger:
+    """
+    Messages are appended to a bounded in-memory queue and written by a background thread, so logging never waits
+    for the filesystem. Once the file exceeds max_size bytes it is rotated to path.1 ... path.backups.
+    """
+    def __init__(self, path='/tmp/pylog', level=LOG_INFO, max_size=1024 * 1024, backups=1, capacity=10000):
+        self._path = path
+        self._level = _LEVELS.index(level)
+        self._max_size = max_size
+        self._backups = backups
+        self._capacity = capacity
+
+        self._cond = Condition(Lock())
+        self._thread = None
+        self._messages = deque()
+        self._writing = False
+
+        """
+        Messages dropped because the queue was full, reported with the next batch written
+        """
+        self._dropped = 0
+
+        """
+        Owned by the writer thread; _reopen is set once path has changed
+        """
+        self._file = None
+        self._size = 0
+        self._reopen = False
+
+    def configure(self, path=None, level=None, max_size=None, backups=None):
+        with self._cond:
+            if path is not None and path != self._path:
+                self._path = path
+                self._reopen = True
+            if level is not None and level in _LEVELS:
+                self._level = _LEVELS.index(level)
+            if max_size is not None:
+                self._max_size = max_size
+            if backups is not None:
+                self._backups = backups
+
+    def is_enabled(self, level):
+        return _LEVELS.index(level) >= self._level and bool(self._path)
+
+    def log(self, msg, level=LOG_INFO):
+        if not self.is_enabled(level):
+            return
+
+        line = "%s [%s] %s\n" % (time.strftime('%H:%M:%S'), level, msg)
+        with self._cond:
+            if len(self._messages) >= self._capacity:
+                self._dropped += 1
+                return
+
+            self._messages.append(line)
+            if self._thread is None:
+                self._thread = Thread(target=lambda: self._loop(), daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, timeout=1.):
+        """
+        Wait until everything logged so far has been written, e.g. before exiting
+        """
+        end = time.time() + timeout
+        with self._cond:
+            while (len(self._messages) > 0 or self._writing) and time.time() < end:
+                self._cond.wait(end - time.time())
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while len(self._messages) == 0:
+                    self._writing = False
+                    self._cond.notify_all()
+                    self._cond.wait()
+
+                lines = list(self._messages)
+                self._messages.clear()
+                if self._dropped > 0:
+                    lines += ["%s [%s] %i messages dropped\n" % (time.strftime('%H:%M:%S'), LOG_WARNING, self._dropped)]
+                    self._dropped = 0
+                self._writing = True
+                path, max_size, backups = self._path, self._max_size, self._backups
+                reopen, self._reopen = self._reopen, False
+
+            try:
+                self._write(lines, path, max_size, backups, reopen)
+            except Exception:
+                """
+                Nowhere left to report this
+                """
+                self._file = None
+
+    def _write(self, lines, path, max_size, backups, reopen):
+        if reopen and self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self._file is None:
+            self._file = open(path, 'a')
+            self._size = self._file.tell()
+
+        data = "".join(lines)
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+        if max_size > 0 and self._size > max_size:
+            self._file.close()
+            self._file = None
+            self._rotate(path, backups)
+
+    def _rotate(self, path, backups):
+        if backups <= 0:
+            os.remove(path)
+            return
+
+        for i in range(backups - 1, 0, -1):
+            if os.path.exists("%s.%i" % (path, i)):
+                os.replace("%s.%i" % (path, i), "%s.%i" % (path, i + 1))
+        os.replace(path, "%s.1" % path)
+
+
+LOGGER = Logger()
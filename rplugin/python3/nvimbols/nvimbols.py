@@ -1,11 +1,17 @@
 import os
+import hashlib
 from threading import Lock
 
 from nvimbols.content import Content, Wrapper, Highlight
 from nvimbols.denite_content import DeniteContent
 from nvimbols.util import log, on_error
 from nvimbols.graph import SymbolsGraph
+from nvimbols.cache import GraphCache
+from nvimbols.prefetch import Prefetcher
 from nvimbols.observable import Observable
+from nvimbols.symbol import parse_location
+from nvimbols.stats import STATS
+from nvimbols.traversal import DIRECTION_SOURCE, DIRECTION_TARGET
 
 
 def setup_nvimbols_help():
@@ -15,6 +21,10 @@ def setup_nvimbols_help():
     content += Wrapper("\n ", Highlight('PreProc', "f"), ": Follow symbol")
     content += Wrapper("\n ", Highlight('PreProc', "v"), ": Follow symbol in split")
     content += Wrapper("\n ", Highlight('PreProc', "o"), ": Switch mode")
+    content += Wrapper("\n ", Highlight('PreProc', "m"), ": Load more entries")
+    content += Wrapper("\n ", Highlight('PreProc', "t"), ": Tree of the current symbol")
+    content += Wrapper("\n ", Highlight('PreProc', "r"), ": Next relation in tree")
+    content += Wrapper("\n ", Highlight('PreProc', "x"), ": Collapse/expand tree node")
     content += Wrapper("\n ", Highlight('PreProc', "?"), ": Close help")
     content += "\n\nDefault keymappings:"
     content += Wrapper("\n ", Highlight('PreProc', "<leader>sf"), ": Follow target")
@@ -30,7 +40,7 @@ def setup_nvimbols_help():
 
 
 class NVimbols(Observable):
-    def __init__(self, parent, source):
+    def __init__(self, parent, source, config):
         super().__init__()
 
         self._parent = parent
@@ -38,53 +48,265 @@ class NVimbols(Observable):
         self.filetypes = source.filetypes
 
         self._graph = SymbolsGraph(self._source, self)
+        self._graph.set_capacity(config.get('nvimbols_max_symbols', 0), config.get('nvimbols_max_memory', 0))
         self._source.set_graph(self._graph)
         self._current_location = None
 
+        """
+        Opt-in on-disk cache, one file per source and project root
+        """
+        self._cache = None
+        if config.get('nvimbols_cache_dir', ''):
+            root = hashlib.sha1(config.get('cwd', os.getcwd()).encode('utf-8')).hexdigest()[:16]
+            path = os.path.join(os.path.expanduser(config['nvimbols_cache_dir']), "%s-%s.sqlite" % (source.name, root))
+            self._cache = GraphCache(path)
+            self._graph.set_cache(self._cache)
+
+        """
+        Optional speculative loading of symbols the user is likely to jump to
+        """
+        self._prefetcher = None
+        if config.get('nvimbols_prefetch', ''):
+            self._prefetcher = Prefetcher(self._graph, config['nvimbols_prefetch'], config.get('nvimbols_prefetch_count', 5))
+            self._graph.set_prefetcher(self._prefetcher, config.get('nvimbols_prefetch_budget', 4))
+
         self._help_content = setup_nvimbols_help()
 
         """
-        Pass notifications through
+        Pass notifications through to the observers of the sidebar ('render') and Denite ('denite'),
+        but only if they concern one of the wrappers displayed in that view.
         """
-        self._graph.on_update(lambda: self._notify())
+        self._graph_obsids = {
+            'render': self._graph.on_update(lambda: self._notify(['render']), []),
+            'denite': self._graph.on_update(lambda: self._notify(['denite']), [])
+        }
 
         """
         'symbol': Display info about the symbol, the cursor is on
         'help': Display help
         'list': List symbols in file
+        'tree': Display the tree of symbols reachable from one symbol
+        'stats': Display latencies and counters, see STATS
 
         Implemented as stack
         """
         self._mode = ['symbol']
 
+        """
+        Tree mode: root wrapper, relation (reference, direction) followed, wrappers collapsed or expanded by the user, and limits
+        """
+        self._tree_root = None
+        self._tree_relations = [(ref, d) for ref in source.references for d in (DIRECTION_SOURCE, DIRECTION_TARGET)]
+        self._tree_relation = 0
+        self._tree_toggled = set()
+        self._tree_depth = config.get('nvimbols_tree_depth', 3)
+        self._tree_fanout = config.get('nvimbols_tree_fanout', 20)
+
+        """
+        (key, content) of the last render, reused as long as nothing rendered has changed
+        """
+        self._last_render = None
+        self._last_render_denite = None
+
     def cancel(self):
-        self._graph.cancel()
+        self._graph.shutdown()
+
+    def on_update_view(self, func, view):
+        """
+        func is called on updates concerning the view 'render' or 'denite' only
+        """
+        return self.on_update(func, [view])
+
+    def _set_keys(self, view, wrapper):
+        """
+        Observe the wrappers displayed along with wrapper. Without a wrapper (e.g. while the cache is read for a file
+        visited first, see SymbolsGraph.require_at_location) any update is observed, the one creating it included.
+        """
+        wrappers = self._graph.pin_neighbourhood(view, wrapper)
+        self._graph.set_keys(self._graph_obsids[view], wrappers if wrapper is not None else None)
 
     def render(self):
         if self._mode[0] == 'symbol':
-            return self._source.render(self._graph.get(self._current_location))
+            wrapper = self._graph.get(self._current_location)
+            self._set_keys('render', wrapper)
+            if wrapper is None:
+                """
+                Rendering runs on its own thread, possibly before the new location has been required
+                """
+                content = Content()
+                content += "..."
+                return content
+
+            key = (wrapper, wrapper.version_key())
+            if self._last_render is not None and self._last_render[0] == key:
+                return self._last_render[1]
+
+            content = self._source.render(wrapper)
+            self._last_render = (key, content)
+            return content
         elif self._mode[0] == 'help':
             return self._help_content
         elif self._mode[0] == 'list':
-            # TODO
-            return Content()
+            filename = self._current_location.filename if self._current_location is not None else None
+            if filename is None:
+                return Content()
+
+            wrappers = self._graph.outline(filename)
+            self._graph.set_keys(self._graph_obsids['render'], [('outline', filename)] + (wrappers or []))
+
+            key = (filename, wrappers is None, tuple((w, w.symbol.version) for w in wrappers or []))
+            if self._last_render is not None and self._last_render[0] == key:
+                return self._last_render[1]
+
+            content = self._source.render_file(filename, wrappers)
+            self._last_render = (key, content)
+            return content
+        elif self._mode[0] == 'tree':
+            return self._render_tree()
+        elif self._mode[0] == 'stats':
+            self._graph.set_keys(self._graph_obsids['render'], [])
+            return self._render_stats()
+
+    def _render_tree(self):
+        if self._tree_root is None:
+            self._graph.set_keys(self._graph_obsids['render'], [])
+            content = Content()
+            content += "No symbol"
+            return content
+
+        reference, direction = self._tree_relations[self._tree_relation]
+        tree, complete = self._graph.traverse(self._tree_root, reference, direction, self._tree_depth, self._tree_fanout,
+                                              toggled=self._tree_toggled)
+
+        wrappers = [node.wrapper for node in tree.walk()]
+        self._graph.pin('render', wrappers)
+        self._graph.set_keys(self._graph_obsids['render'], wrappers)
+
+        title = reference.display_targets if direction == DIRECTION_SOURCE else reference.display_sources
+        return self._source.render_tree(tree, title)
 
     def render_denite(self, mode):
         if mode == 'symbol':
-            return self._source.render_denite(self._graph.get(self._current_location))
+            wrapper = self._graph.get(self._current_location)
+            self._set_keys('denite', wrapper)
+            if wrapper is None:
+                return DeniteContent()
+
+            key = (wrapper, wrapper.version_key())
+            if self._last_render_denite is not None and self._last_render_denite[0] == key:
+                return self._last_render_denite[1]
+
+            if self._last_render_denite is None or self._last_render_denite[0][0] is not wrapper:
+                self._source.reset_denite()
+            content = self._source.render_denite(wrapper)
+            self._last_render_denite = (key, content)
+            return content
         elif mode == 'list':
-            # TODO
-            return DeniteContent()
+            filename = self._current_location.filename if self._current_location is not None else None
+            if filename is None:
+                return DeniteContent()
+
+            wrappers = self._graph.outline(filename)
+            self._graph.set_keys(self._graph_obsids['denite'], [('outline', filename)] + (wrappers or []))
+            return self._source.render_denite_file(filename, wrappers)
+
+    def close_denite(self):
+        self._last_render_denite = None
+        self._source.reset_denite()
+        self._graph.unpin('denite')
+        self._graph.set_keys(self._graph_obsids['denite'], [])
+
+    def eviction_stats(self):
+        return dict(self._graph.eviction_stats)
+
+    def queue_stats(self):
+        return self._graph.queue_stats()
+
+    def coalesce_stats(self):
+        return dict(self._graph.coalesce_stats)
+
+    def async_stats(self):
+        return self._graph.async_stats() or {}
+
+    def cache_stats(self):
+        return dict(self._cache.stats) if self._cache is not None else {}
+
+    def process_stats(self):
+        return self._graph.process_stats() or {}
+
+    def _render_stats(self):
+        content = Content()
+        content += Highlight('Title', "NVimbols Stats")
+
+        timings = STATS.percentiles()
+        content += Highlight('Title', "\n\n  ----  Latencies (ms)  ----  \n")
+        if not STATS.enabled:
+            content += "Disabled, see g:nvimbols_stats\n"
+        else:
+            content += "%-22s %7s %7s %7s %7s %7s\n" % ("", "count", "p50", "p90", "p99", "max")
+            for stage in sorted(timings):
+                t = timings[stage]
+                content += Wrapper(Highlight('PreProc', "%-22s" % stage), " %7i %7.1f %7.1f %7.1f %7.1f\n" % (
+                    t['count'], t['p50'] * 1e3, t['p90'] * 1e3, t['p99'] * 1e3, t['max'] * 1e3))
+
+        queue = self.queue_stats()
+        content += Highlight('Title', "\n  ----  Queue  ----  \n")
+        for priority in sorted(queue):
+            q = queue[priority]
+            content += Wrapper(Highlight('PreProc', "priority %i" % priority), ": %i waiting, %i dispatched, %i dropped\n" % (
+                q['queued'], q['dispatched'], q['dropped']))
+
+        cache = self.cache_stats()
+        lookups = cache.get('hits', 0) + cache.get('misses', 0) + cache.get('stale', 0)
+        if lookups > 0:
+            cache['hit_rate'] = "%.0f%%" % (100. * cache['hits'] / lookups)
+
+        sections = [
+            ("RPC", self._parent.rpc_stats()),
+            ("Cursor", self._parent.location_stats()),
+            ("Eviction", self.eviction_stats()),
+            ("Coalescing", self.coalesce_stats()),
+            ("Async", self.async_stats()),
+            ("Processes", self.process_stats()),
+            ("Cache", cache),
+            ("Renderer", self._parent.renderer_stats())
+        ]
+        for title, stats in sections:
+            if len(stats) == 0:
+                continue
+            content += Highlight('Title', "\n  ----  %s  ----  \n" % title)
+            for key in stats:
+                content += Wrapper(Highlight('PreProc', key), ": %s\n" % stats[key])
+
+        return content
 
     def get_at_current_location(self):
         return self._graph.get(self._current_location)
 
-    def update_location(self, location):
+    def update_location(self, location, visible=None):
         self._current_location = location
+        if self._prefetcher is not None and visible is not None:
+            self._prefetcher.set_visible(location.filename, visible[0], visible[1])
+
         self._graph.require_at_location(location)
-        self.render()
 
-    def command(self, command):
+        """
+        Rendered by the observers of 'render' on their own thread
+        """
+        self._notify(['render'])
+
+        if self._prefetcher is not None:
+            self._prefetcher.step()
+
+    def file_changed(self, filename, first, last, delta):
+        self._graph.invalidate_lines(filename, first, last, delta)
+        if self._current_location is not None and self._current_location.filename == filename:
+            self.update_location(self._current_location)
+
+    def file_written(self, filename):
+        self._graph.invalidate_file(filename)
+
+    def command(self, command, arg=None):
         if command == 'clear':
             self._graph.clear()
             self.update_location(self._current_location)
@@ -95,8 +317,46 @@ class NVimbols(Observable):
             else:
                 self._mode = ['help'] + self._mode
 
+        elif command == 'stats':
+            if self._mode[0] == 'stats':
+                del self._mode[0]
+            else:
+                self._mode = ['stats'] + self._mode
+
+        elif command == 'more':
+            """
+            Next page of all paged reference lists of the current symbol
+            """
+            wrapper = self._graph.get(self._current_location)
+            if wrapper is not None:
+                for loadable in wrapper.loadables():
+                    if loadable is not wrapper.symbol:
+                        loadable.request_more()
+
+        elif command == 'tree':
+            if self._mode[0] == 'tree':
+                del self._mode[0]
+            elif self._mode[0] not in ('help', 'stats'):
+                self._tree_root = self._graph.get(self._current_location) if self._current_location is not None else None
+                self._tree_toggled = set()
+                self._mode = ['tree'] + self._mode
+
+        elif command == 'tree_relation':
+            self._tree_relation = (self._tree_relation + 1) % len(self._tree_relations)
+
+        elif command == 'toggle':
+            """
+            arg is the link target of the node under the cursor
+            """
+            wrapper = self._graph.get(parse_location(arg)) if arg else None
+            if wrapper is not None:
+                if wrapper in self._tree_toggled:
+                    self._tree_toggled.remove(wrapper)
+                else:
+                    self._tree_toggled.add(wrapper)
+
         elif command == 'switch_mode':
-            if self._mode[0] == 'help':
+            if self._mode[0] in ('help', 'stats'):
                 return
 
             if self._mode[0] == 'symbol':
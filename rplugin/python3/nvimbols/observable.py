@@ -4,18 +4,35 @@ from nvimbols.util import on_error
 class Observable:
     def __init__(self):
         self._observers = {}
+        self._keys = {}
         self._id = 0
 
-    def on_update(self, func):
+    def on_update(self, func, keys=None):
+        """
+        func is called on every update if keys is None, otherwise only on updates concerning at least one of keys
+        """
         self._id += 1
         self._observers[self._id] = func
+        self._keys[self._id] = None if keys is None else set(keys)
         return self._id
 
+    def set_keys(self, id_, keys):
+        if id_ in self._observers:
+            self._keys[id_] = None if keys is None else set(keys)
+
     def remove_on_update(self, id_):
         del self._observers[id_]
+        del self._keys[id_]
+
+    def _notify(self, changed=None):
+        """
+        changed: keys concerned by this update, None if everything might have changed
+        """
+        for id_ in list(self._observers):
+            keys = self._keys.get(id_)
+            if changed is not None and keys is not None and keys.isdisjoint(changed):
+                continue
 
-    def _notify(self):
-        for id_ in self._observers:
             try:
                 self._observers[id_]()
             except Exception as err:
@@ -0,0 +1,60 @@
+PREFETCH_TARGETS = 'targets'
+PREFETCH_VISIBLE = 'visible'
+
+
+class Prefetcher:
+    """
+    Speculatively loads symbols and PREVIEW reference lists the user is likely to look at next, either
+
+        'targets': the first count entries of each reference list of the current symbol, or
+        'visible': the symbols known on the lines visible in the window.
+
+    Runs only while the queue has no jobs waiting; requests go through SymbolsGraph.request_prefetch,
+    so they have lowest priority and their number is limited.
+    """
+    def __init__(self, graph, mode, count):
+        self._graph = graph
+        self._mode = mode
+        self._count = count
+
+        """
+        (filename, first line, last line) visible in the window
+        """
+        self._visible = None
+
+    def set_visible(self, filename, first, last):
+        self._visible = (filename, first, last)
+
+    def _wrappers(self):
+        if self._mode == PREFETCH_TARGETS:
+            current = self._graph.current()
+            if current is None:
+                return
+
+            for loadable in current.loadables():
+                if loadable is not current.symbol and loadable.is_loaded():
+                    yield from loadable.get()[:self._count]
+
+        elif self._mode == PREFETCH_VISIBLE:
+            if self._visible is None:
+                return
+
+            yield from self._graph.in_lines(*self._visible)
+
+    def _candidates(self):
+        for wrapper in self._wrappers():
+            yield wrapper.symbol, wrapper.symbol.levels[-1]
+            for loadable in wrapper.loadables(create=True):
+                if loadable is not wrapper.symbol:
+                    yield loadable, loadable.levels[0]
+
+    def step(self):
+        if not self._graph.is_idle():
+            return
+
+        for loadable, level in self._candidates():
+            if loadable.is_loaded(level) or loadable.is_loading():
+                continue
+
+            if not self._graph.request_prefetch(loadable, level):
+                break
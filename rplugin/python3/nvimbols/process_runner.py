@@ -0,0 +1,130 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from nvimbols.util import on_error, import_plugin
+
+
+"""
+The source instance of a worker process, see _init_worker
+"""
+_source = None
+
+
+def _init_worker(path, cls):
+    """
+    Worker processes start from a fresh interpreter, so the source is imported again: from the file it has been
+    found in (source.path), or by its class otherwise. It is created without vim.
+    """
+    global _source
+    if path is not None:
+        cls = import_plugin(path, 'source', 'Source')
+    _source = cls(None)
+
+
+def _compute(name, request):
+    return getattr(_source, name)(request)
+
+
+def _context():
+    """
+    Forking neovim's plugin host, which always runs several threads, could leave locks held in the child
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ProcessRunner:
+    """
+    Runs the compute_* methods of a source in a pool of worker processes. Requests and results are
+    plain data; the pool is created on first use.
+    """
+    def __init__(self, source, processes, vim=None):
+        path = getattr(source, 'path', None)
+        self._initargs = (path, None if path is not None else type(source))
+        self._processes = processes
+        self._vim = vim
+
+        self._lock = Lock()
+        self._pool = None
+
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'cancelled': 0,
+            'failed': 0
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def submit(self, name, request, on_done):
+        """
+        Call source.name(request) in a worker; on_done(cancelled, result) is called once it has finished or has been
+        cancelled. Returns a handle to be passed to cancel.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self._processes, mp_context=_context(),
+                                                 initializer=_init_worker, initargs=self._initargs)
+            self._stats['submitted'] += 1
+            pool = self._pool
+            future = pool.submit(_compute, name, request)
+
+        future.add_done_callback(lambda f: self._finish(f, on_done, pool))
+        return future
+
+    def cancel(self, handle):
+        """
+        Only requests which have not been started yet can be cancelled
+        """
+        handle.cancel()
+
+    def _finish(self, future, on_done, pool):
+        result = None
+        cancelled = future.cancelled()
+        status = 'cancelled' if cancelled else 'completed'
+        if not cancelled:
+            try:
+                result = future.result()
+            except Exception as err:
+                cancelled = True
+                if self._pool is not pool:
+                    """
+                    Killed by shutdown
+                    """
+                    status = 'cancelled'
+                else:
+                    on_error(self._vim, err)
+                    status = 'failed'
+
+        with self._lock:
+            self._stats[status] += 1
+
+        try:
+            on_done(cancelled, result)
+        except Exception as err:
+            on_error(self._vim, err)
+
+    def shutdown(self):
+        """
+        Stop the pool, on VimLeave. Waiting requests are cancelled and running ones are killed, as the pool would
+        otherwise keep the interpreter, and thereby neovim, from exiting until they are done. The next submit
+        starts a new pool.
+        """
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+
+        if pool is None:
+            return
+
+        if hasattr(pool, 'terminate_workers'):
+            pool.terminate_workers()
+            return
+
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
@@ -0,0 +1,88 @@
+class BufferRenderer:
+    """
+    Puts Content into a neovim buffer. Only lines which changed compared to the previously put
+    Content (text or highlights) are replaced, and all API calls are sent in a single nvim_call_atomic.
+    """
+    def __init__(self, vim):
+        self._vim = vim
+        self._namespace = None
+
+        self._buffer = None
+        self._lines = []
+
+        self.stats = {
+            'puts': 0,
+            'lines_sent': 0,
+            'lines_skipped': 0,
+            'highlights_sent': 0
+        }
+
+    def invalidate(self):
+        """
+        Next put replaces the whole buffer
+        """
+        self._buffer = None
+        self._lines = []
+
+    def _signatures(self, content):
+        highlights = {}
+        for h in content.highlights():
+            highlights.setdefault(h.line - 1, []).append((h.name, h.start_col - 1, h.end_col - 1 if h.end_col >= 1 else -1))
+
+        return [(text, tuple(highlights.get(i, ()))) for i, text in enumerate(content.raw())]
+
+    def _changed_range(self, old, new):
+        """
+        Returns start, old_end, new_end such that old[start:old_end] has to be replaced by new[start:new_end]
+        """
+        start = 0
+        n = min(len(old), len(new))
+        while start < n and old[start] == new[start]:
+            start += 1
+
+        old_end, new_end = len(old), len(new)
+        while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+
+        return start, old_end, new_end
+
+    def put(self, buffer, content, jumps):
+        """
+        Must be called on the neovim event loop (threadsafe_call). buffer is a buffer number, or -1 if
+        the window is not open; in this case only jumps are set.
+        """
+        if self._namespace is None:
+            self._namespace = self._vim.api.create_namespace('nvimbols')
+
+        calls = []
+
+        if buffer != -1:
+            lines = self._signatures(content)
+            old = self._lines if buffer == self._buffer else None
+
+            if old is None:
+                start, old_end, new_end = 0, -1, len(lines)
+            else:
+                start, old_end, new_end = self._changed_range(old, lines)
+
+            if old is None or start != old_end or start != new_end:
+                calls += [['nvim_buf_set_option', [buffer, 'modifiable', True]]]
+                calls += [['nvim_buf_set_lines', [buffer, start, old_end, False, [text for text, _ in lines[start:new_end]]]]]
+                calls += [['nvim_buf_clear_namespace', [buffer, self._namespace, start, new_end]]]
+                for i in range(start, new_end):
+                    for name, start_col, end_col in lines[i][1]:
+                        calls += [['nvim_buf_add_highlight', [buffer, self._namespace, name, i, start_col, end_col]]]
+                        self.stats['highlights_sent'] += 1
+                calls += [['nvim_buf_set_option', [buffer, 'modifiable', False]]]
+
+            self.stats['lines_sent'] += new_end - start
+            self.stats['lines_skipped'] += len(lines) - (new_end - start)
+
+            self._buffer = buffer
+            self._lines = lines
+
+        calls += [['nvim_call_function', ['nvimbols#set_jumps', [jumps]]]]
+
+        self.stats['puts'] += 1
+        self._vim.api.call_atomic(calls)
@@ -4,7 +4,7 @@ from nvimbols.content import Content, Wrapper, Highlight, Link
 from nvimbols.denite_content import DeniteContent
 from nvimbols.reference import TargetRef, ParentRef, InheritanceRef
 from nvimbols.util import log
-from nvimbols.loadable import LOADABLE_PREVIEW, LOADABLE_FULL
+from nvimbols.loadable import LOADABLE_PREVIEW, LOADABLE_FULL, LOADABLE_PAGE
 
 
 class Base:
@@ -19,11 +19,44 @@ class Base:
         self.filetypes = []
         self.references = [TargetRef, ParentRef, InheritanceRef]
 
+        """
+        Levels at which reference lists are loaded, each including the previous ones; must end with LOADABLE_FULL.
+        E.g. [LOADABLE_COUNT, LOADABLE_PAGE, LOADABLE_FULL] to show the number of entries at once and load big
+        lists page_size entries at a time.
+        """
+        self.levels = [LOADABLE_PREVIEW, LOADABLE_FULL]
+        self.page_size = 100
+
         """
         Maximal number of parallel tasks. For non-thredsafe source, this must be set to 1.
         """
         self.tasks = 4
 
+        """
+        Only used if the source implements load_symbols, load_sources_of or load_targets_of: Maximal number
+        of requests passed in one call, and time in seconds to wait for further requests to join a batch.
+        """
+        self.batch_size = 50
+        self.batch_window = 0.01
+
+        """
+        Only used if the source implements async_load_symbol, async_load_source_of or async_load_target_of:
+        Maximal number of coroutines running at a time.
+        """
+        self.async_tasks = 64
+
+        """
+        Only used if the source implements compute_symbol, compute_source_of or compute_target_of: Number of worker
+        processes running them. 0 runs them in the worker threads as well.
+        """
+        self.processes = 0
+
+        """
+        Reference list Loadable -> (number of entries, last entry) turned into candidates by render_denite since
+        reset_denite, so streamed lists only add their new entries
+        """
+        self._denite_emitted = {}
+
     def set_graph(self, graph):
         self._graph = graph
 
@@ -68,6 +101,12 @@ class Base:
             symbol.source_of[reference.name].set([self._graph.create_wrapper(location1), self._graph.create_wrapper(location2)])
 
         Second parameter of set is the loaded level, should match requested_level (or a higher level). Defaults to LOADABLE_FULL.
+
+        If self.levels contains them, requested_level can also be
+            LOADABLE_COUNT: Place the number of entries only by
+                symbol.source_of[reference.name].set([], LOADABLE_COUNT, total=count)
+            LOADABLE_PAGE: Place the entries params['offset'] to params['offset'] + params['limit'] by
+                symbol.source_of[reference.name].set_page([...], total=count)  # total optional if already known
         """
         pass
 
@@ -87,9 +126,124 @@ class Base:
             symbol.target_of[reference.name].set([self._graph.create_wrapper(location1), self._graph.create_wrapper(location2)])
 
         Second parameter of set is the loaded level, should match requested_level (or a higher level). Defaults to LOADABLE_FULL.
+
+        Long lists can be streamed instead (this holds for load_source_of as well), so they are displayed while loading:
+            symbol.target_of[reference.name].extend([self._graph.create_wrapper(location1)])
+            symbol.target_of[reference.name].extend([self._graph.create_wrapper(location2)])
+            symbol.target_of[reference.name].extend([], done=True)
         """
         pass
 
+    def load_symbols(self, params_list):
+        """
+        Optional batch variant of load_symbol: params_list contains the params of several requests,
+        each of which is handled as in load_symbol. Implement this if the backend can answer many
+        locations in a single round trip.
+        """
+        for params in params_list:
+            self.load_symbol(params)
+
+    def load_sources_of(self, params_list):
+        """
+        Optional batch variant of load_source_of, see load_symbols. References may differ between the params.
+        """
+        for params in params_list:
+            self.load_source_of(params)
+
+    def load_targets_of(self, params_list):
+        """
+        Optional batch variant of load_target_of, see load_symbols. References may differ between the params.
+        """
+        for params in params_list:
+            self.load_target_of(params)
+
+    def supports_batch(self, type_):
+        """
+        True if the batch variant for requests of type_ ('symbol', 'source', 'target') is implemented
+        """
+        name = {'symbol': 'load_symbols', 'source': 'load_sources_of', 'target': 'load_targets_of'}[type_]
+        return getattr(type(self), name) is not getattr(Base, name)
+
+    async def async_load_symbol(self, params):
+        """
+        Optional asyncio variant of load_symbol, used instead of it if implemented. Runs on a single event
+        loop shared by all requests, so it must not block; it may be cancelled (e.g. once the cursor has left the
+        location), which is signalled by asyncio.CancelledError as usual.
+        """
+        raise NotImplementedError()
+
+    async def async_load_source_of(self, params):
+        """
+        Optional asyncio variant of load_source_of, see async_load_symbol
+        """
+        raise NotImplementedError()
+
+    async def async_load_target_of(self, params):
+        """
+        Optional asyncio variant of load_target_of, see async_load_symbol
+        """
+        raise NotImplementedError()
+
+    def supports_async(self, type_=None):
+        """
+        True if the asyncio variant for requests of type_ ('symbol', 'source', 'target'), or any of them, is implemented
+        """
+        names = {'symbol': 'async_load_symbol', 'source': 'async_load_source_of', 'target': 'async_load_target_of'}
+        types = [type_] if type_ is not None else list(names)
+        return any(getattr(type(self), names[t]) is not getattr(Base, names[t]) for t in types)
+
+    def compute_symbol(self, request):
+        """
+        Optional variant of load_symbol for CPU-heavy sources, used instead of it if implemented. It receives and
+        returns plain data, so it can run in a separate process (see self.processes). There, the source is imported
+        again and created with vim None; it shares no state with the instance in neovim's plugin host.
+
+        request contains:
+            'type'
+            'location'          # SymbolLocation
+            'reference'         # None
+            'requested_level'
+            'loaded_level'
+
+        Return (symbol, location), where symbol is a Symbol (or None if there is no symbol at that location) and
+        location the SymbolLocation spanning the whole symbol (or None to keep the requested one).
+        """
+        raise NotImplementedError()
+
+    def compute_source_of(self, request):
+        """
+        Optional variant of load_source_of, see compute_symbol. request['reference'] is the name of the reference,
+        request['offset'] and request['limit'] are set for LOADABLE_PAGE.
+
+        Return a list of SymbolLocation, or the number of entries for LOADABLE_COUNT.
+        """
+        raise NotImplementedError()
+
+    def compute_target_of(self, request):
+        """
+        Optional variant of load_target_of, see compute_symbol and compute_source_of.
+        """
+        raise NotImplementedError()
+
+    def load_file(self, filename):
+        """
+        Optional: Return all symbols in filename as list of (SymbolLocation, Symbol), each location spanning the whole
+        symbol. Used for the list mode, and to resolve cursor locations in that file without calling load_symbol, so it
+        must contain every symbol load_symbol could find there.
+        """
+        raise NotImplementedError()
+
+    def supports_file(self):
+        return type(self).load_file is not Base.load_file
+
+    def supports_process(self, type_=None):
+        """
+        True if compute_* for requests of type_ ('symbol', 'source', 'target'), or any of them, is implemented
+        """
+        names = {'symbol': 'compute_symbol', 'source': 'compute_source_of', 'target': 'compute_target_of'}
+        types = [type_] if type_ is not None else list(names)
+        return any(getattr(type(self), names[t]) is not getattr(Base, names[t]) for t in types)
+
     def render(self, wrapper):
         """
         Method returns a Content instance
@@ -102,6 +256,54 @@ class Base:
         def max_slice(n, arr):
             return arr if len(arr) < n else arr[:n]
 
+        def render_partial(loadable):
+            partial = loadable.get_partial(100)
+            if partial is None:
+                content.append("...")
+                return
+
+            for w in partial:
+                content.append(Link(w.location, Highlight('Type', "%s:%i\n" % (os.path.basename(w.location.filename), w.location.start_line))))
+            content.append(Highlight('PreProc', "[%i, loading...]\n" % max(len(partial), loadable.partial_length())))
+
+        def render_list(loadable, title, quickjump):
+            """
+            Shows what is there at the first level (e.g. only the count) at once, and loads up to the
+            second to last level (the last one is left to Denite)
+            """
+            first = loadable.levels[0]
+            display = loadable.levels[-2] if len(loadable.levels) > 1 else first
+
+            if loadable.total is not None:
+                title = "%s (%i)" % (title, loadable.total)
+            content.append(Highlight('Title', "\n  ----  " + title + "  ----  \n"))
+
+            if(not loadable.is_loaded(first)):
+                loadable.request(first)
+                loadable.request(display)
+                render_partial(loadable)
+                return
+
+            loadable.request(display)
+            data = loadable.get()
+
+            if len(data) > 0:
+                content.add_quickjump(quickjump, data[0].location)
+
+            """
+            Pages are loaded on demand, so all of them are shown
+            """
+            limit = len(data) if LOADABLE_PAGE in loadable.levels else 100
+            for w in max_slice(limit, data):
+                content.append(Link(w.location, Highlight('Type', "%s:%i\n" % (os.path.basename(w.location.filename), w.location.start_line))))
+
+            if(not loadable.is_loaded(display)):
+                content.append("...")
+            elif loadable.loaded_level() == LOADABLE_PAGE:
+                content.append(Highlight('PreProc', "[%i of %s, m: more]\n" % (len(data), loadable.total if loadable.total is not None else '?')))
+            elif (not loadable.is_loaded(LOADABLE_FULL)) or len(data) > limit:
+                content.append(Highlight('PreProc', "[...]\n"))
+
         if(not wrapper.symbol.is_loaded()):
             content += "..."
             wrapper.symbol.request()
@@ -117,53 +319,126 @@ class Base:
                     content += Wrapper("    %s: " % d, Highlight('Type', symbol.data[d]), "\n")
 
                 for ref in self.references:
-                    source_of = wrapper.source_of[ref.name]
-                    content += Highlight('Title', "\n  ----  " + ref.display_targets + "  ----  \n")
+                    render_list(wrapper.source_of[ref.name], ref.display_targets, "first_source_of_%s" % ref.name)
+                    render_list(wrapper.target_of[ref.name], ref.display_sources, "first_target_of_%s" % ref.name)
 
-                    if(not source_of.is_loaded()):
-                        content += "..."
-                        source_of.request(LOADABLE_PREVIEW)
-                    else:
-                        is_preview = (not source_of.is_loaded(LOADABLE_FULL)) or (len(source_of.get()) > 100)
+        return content
 
-                        if (source_of.is_loaded(LOADABLE_PREVIEW) and len(source_of.get()) > 0):
-                            content.add_quickjump("first_source_of_%s" % ref.name, source_of.get()[0].location)
+    def _outline_depths(self, wrappers):
+        """
+        Nesting depth of each of the sorted wrappers, given by containment
+        """
+        stack = []
+        for w in wrappers:
+            while len(stack) > 0 and not stack[-1].location.contains(w.location):
+                del stack[-1]
+            yield w, len(stack)
+            stack += [w]
+
+    def render_file(self, filename, wrappers):
+        """
+        Method returns a Content instance for the list mode; wrappers are the symbols in filename sorted by location
+        (see load_file), or None while loading
 
-                        for w in max_slice(100, source_of.get()):
-                            content += Link(w.location, Highlight('Type', "%s:%i\n" % (os.path.basename(w.location.filename), w.location.start_line)))
-                        if is_preview:
-                            content += Highlight('PreProc', "[...]\n")
+        Override this method to implement custom rendering.
+        """
+        content = Content()
+        content += Highlight('Title', "  ----  " + os.path.basename(filename) + "  ----  \n")
 
-                    target_of = wrapper.target_of[ref.name]
-                    content += Highlight('Title', "\n  ----  " + ref.display_sources + "  ----  \n")
+        if not self.supports_file():
+            content += "Not supported by this source"
+        elif wrappers is None:
+            content += "..."
+        else:
+            for w, depth in self._outline_depths(wrappers):
+                symbol = w.symbol.get()
+                if symbol is None:
+                    continue
+                content += Link(w.location, Wrapper("  " * depth, Highlight('Statement', symbol.name), " ",
+                                                    Highlight('Type', symbol.kind), "  %i" % w.location.start_line))
+                content += "\n"
 
-                    if(not target_of.is_loaded(LOADABLE_PREVIEW)):
-                        content += "..."
-                        target_of.request(LOADABLE_PREVIEW)
-                    else:
-                        is_preview = (not target_of.is_loaded(LOADABLE_FULL)) or (len(target_of.get()) > 100)
+        return content
 
-                        if (target_of.is_loaded(LOADABLE_PREVIEW) and len(target_of.get()) > 0):
-                            content.add_quickjump("first_target_of_%s" % ref.name, target_of.get()[0].location)
+    def render_denite_file(self, filename, wrappers):
+        """
+        Method returns denite candidates for the list mode, see render_file and render_denite
+        """
+        result = DeniteContent()
+        result.set_complete(wrappers is not None or not self.supports_file())
 
-                        for w in max_slice(100, target_of.get()):
-                            content += Link(w.location, Highlight('Type', "%s:%i\n" % (os.path.basename(w.location.filename), w.location.start_line)))
+        for w, depth in self._outline_depths(wrappers or []):
+            symbol = w.symbol.get()
+            if symbol is None:
+                continue
+            result += [{
+                'word': "  " * depth + symbol.name + "  " + symbol.kind,
+                'action__path': w.location.filename,
+                'action__line': w.location.start_line,
+                'action__col': w.location.start_col,
+                'action__text': str(w.location),
+                '__hash': hash(w.location)
+            }]
+
+        return result
+
+    def render_tree(self, tree, title):
+        """
+        Method returns a Content instance for the tree mode, tree is the root TreeNode (see nvimbols.traversal)
+
+        Override this method to implement custom rendering.
+        Every line should link to the location of its node, which is used to collapse and expand it.
+        """
+        content = Content()
+        content += Highlight('Title', "  ----  " + title + "  ----  \n")
+
+        markers = {'loading': '.', 'expanded': '-', 'collapsed': '+', 'seen': '^', 'limit': '+'}
+
+        def render_node(node):
+            wrapper = node.wrapper
+            marker = markers[node.state]
+            if node.state == 'expanded' and len(node.children) == 0:
+                marker = ' '
+
+            if not wrapper.symbol.is_loaded():
+                name = "..."
+            elif wrapper.symbol.get() is None:
+                name = "?"
+            else:
+                name = wrapper.symbol.get().name
 
-                        if is_preview:
-                            content += Highlight('PreProc', "[...]\n")
+            content.append(Link(wrapper.location, Wrapper("  " * node.depth + marker + " ",
+                                                          Highlight('Statement', name),
+                                                          Highlight('Type', "  %s:%i" % (os.path.basename(wrapper.location.filename), wrapper.location.start_line)))))
+            content.append("\n")
 
+            for c in node.children:
+                render_node(c)
+
+            if node.truncated > 0:
+                content.append(Highlight('PreProc', "  " * (node.depth + 1) + "[%i more]\n" % node.truncated))
+
+        render_node(tree)
         return content
 
+    def reset_denite(self):
+        """
+        Called whenever Denite starts over, e.g. with another symbol
+        """
+        self._denite_emitted = {}
+
     def render_denite(self, wrapper):
         """
         Method returns denite candidates as list.
 
         Override this method to implement custom rendering.
         If we are still waiting for data, set result.set_complete(False), otherwise True. Defaults to False.
-        Every candidate needs to include a __hash which uniquely identifies this candidate among all candidates
+        Every candidate needs to include a __hash which uniquely identifies this candidate among all candidates.
+        Denite keeps the candidates of earlier calls since reset_denite, so only new ones need to be returned.
         """
         result = DeniteContent()
         result.set_complete()
+        emitted = self._denite_emitted
 
         title_length = 12
         kind_length = 28
@@ -178,7 +453,7 @@ class Base:
             if(not wrapper.symbol.is_loaded()):
                 result.set_complete(False)
                 wrapper.symbol.request()
-                return None
+                return False
 
             info = wrapper.symbol.get().kind if wrapper.symbol.get() is not None else ""
             result += [{
@@ -189,23 +464,48 @@ class Base:
                 'action__text': str(wrapper.location),
                 '__hash': hash(wrapper.location)
             }]
-
-        for ref in self.references:
-            source_of = wrapper.source_of[ref.name]
-            if(not source_of.is_loaded(LOADABLE_FULL)):
-                result.set_complete(False)
-                source_of.request(LOADABLE_FULL)
+            return True
+
+        def entries_after(loadable, count, last):
+            """
+            (count, entries of loadable from count on), starting over at 0 if the list has been replaced since
+            the last entry emitted
+            """
+            start = max(count - 1, 0)
+            if(not loadable.is_loaded(LOADABLE_FULL)):
+                entries = loadable.get_partial(start=start) or []
             else:
-                for w in source_of.get():
-                    wrapper_to_candidate(w, ref.display_targets, result)
+                entries = (loadable.get() or [])[start:]
+
+            if count == 0:
+                return 0, entries
+            if len(entries) > 0 and entries[0] is last:
+                return count, entries[1:]
+            return entries_after(loadable, 0, None)
 
-            target_of = wrapper.target_of[ref.name]
-            if(not target_of.is_loaded(LOADABLE_FULL)):
+        def render_list(loadable, title):
+            if(not loadable.is_loaded(LOADABLE_FULL)):
                 result.set_complete(False)
-                target_of.request(LOADABLE_FULL)
-            else:
-                for w in target_of.get():
-                    wrapper_to_candidate(w, ref.display_sources, result)
+                loadable.request(LOADABLE_FULL)
+
+            """
+            Entries whose symbol is not loaded yet are rendered on a later call; the leading ones rendered are
+            skipped from then on
+            """
+            count, last = emitted.get(loadable, (0, None))
+            count, entries = entries_after(loadable, count, last)
+
+            prefix = True
+            for w in entries:
+                if wrapper_to_candidate(w, title, result) and prefix:
+                    count, last = count + 1, w
+                else:
+                    prefix = False
+            emitted[loadable] = (count, last)
+
+        for ref in self.references:
+            render_list(wrapper.source_of[ref.name], ref.display_targets)
+            render_list(wrapper.target_of[ref.name], ref.display_sources)
 
         return result
 
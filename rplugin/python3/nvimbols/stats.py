@@ -0,0 +1,67 @@
+from collections import deque
+from threading import Lock
+
+
+class Stats:
+    """
+    Latencies of hot-path stages, the last capacity of each kept in a ring buffer. Disabled by default; call sites
+    check enabled before taking the time, so instrumentation costs one attribute lookup when disabled:
+
+        t = time.perf_counter() if STATS.enabled else None
+        ...
+        if t is not None:
+            STATS.record('render', time.perf_counter() - t)
+    """
+    def __init__(self, capacity=1000):
+        self.enabled = False
+        self._capacity = capacity
+        self._lock = Lock()
+
+        """
+        stage -> deque of latencies in seconds, and total number recorded
+        """
+        self._samples = {}
+        self._counts = {}
+
+    def enable(self, enabled=True, capacity=None):
+        with self._lock:
+            self.enabled = enabled
+            if capacity is not None and capacity != self._capacity:
+                self._capacity = capacity
+                self._samples = {stage: deque(samples, capacity) for stage, samples in self._samples.items()}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = deque(maxlen=self._capacity)
+                self._samples[stage] = samples
+                self._counts[stage] = 0
+            samples.append(seconds)
+            self._counts[stage] += 1
+
+    def clear(self):
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+
+    def percentiles(self, points=(50, 90, 99)):
+        """
+        stage -> {'count': total recorded, 'p50': ..., 'max': ...} in seconds, over the samples in the ring buffer
+        """
+        with self._lock:
+            snapshot = {stage: (sorted(samples), self._counts[stage]) for stage, samples in self._samples.items()}
+
+        result = {}
+        for stage, (samples, count) in snapshot.items():
+            if len(samples) == 0:
+                continue
+            entry = {'count': count}
+            for p in points:
+                entry['p%i' % p] = samples[min(len(samples) - 1, len(samples) * p // 100)]
+            entry['max'] = samples[-1]
+            result[stage] = entry
+        return result
+
+
+STATS = Stats()
@@ -1,14 +1,22 @@
+import sys
+
+
 class SymbolLocation:
     """
     Includes lines start_line... end_line and columns start_col... end_col-1
+
+    Sources update the fields in place once the extent of a symbol is known, so the hash is computed from the fields
+    on every call (cheap, as filenames are interned and cache their own hash) instead of being stored.
     """
+    __slots__ = ('filename', 'start_line', 'start_col', 'end_line', 'end_col')
+
     def __init__(self, filename, start_line, start_col, end_line=None, end_col=None):
         if(end_line is None):
             end_line = start_line
         if(end_col is None):
             end_col = start_col + 1
 
-        self.filename = filename
+        self.filename = sys.intern(filename)
         self.start_line = start_line
         self.end_line = end_line
         self.start_col = start_col
@@ -30,13 +38,34 @@ class SymbolLocation:
         return self.__str__()
 
     def __hash__(self):
-        return hash(self.__repr__())
+        return hash((self.filename, self.start_line, self.start_col, self.end_line, self.end_col))
 
     def __eq__(self, other):
-        return self.__hash__() == other.__hash__()
+        if self is other:
+            return True
+        if not isinstance(other, SymbolLocation):
+            return NotImplemented
+
+        """
+        Lines differ most often; interned filenames mostly compare by identity
+        """
+        return (self.start_line == other.start_line and
+                self.start_col == other.start_col and
+                self.end_line == other.end_line and
+                self.end_col == other.end_col and
+                self.filename == other.filename)
 
     def __ne__(self, other):
-        return not self.__eq__(other)
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+
+def parse_location(string):
+    """
+    Inverse of str(SymbolLocation)
+    """
+    filename, start_line, start_col, end_line, end_col = string.rsplit(':', 4)
+    return SymbolLocation(filename, int(start_line), int(start_col), int(end_line), int(end_col))
 
 
 class Symbol:
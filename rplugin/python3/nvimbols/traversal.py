@@ -0,0 +1,101 @@
+from collections import deque
+
+
+TRAVERSE_BFS = 'bfs'
+TRAVERSE_DFS = 'dfs'
+
+"""
+Reference lists to follow: wrapper.source_of[reference.name] or wrapper.target_of[reference.name]
+"""
+DIRECTION_SOURCE = 'source'
+DIRECTION_TARGET = 'target'
+
+
+class TreeNode:
+    """
+    One occurrence of a wrapper in a traversal. state is one of
+        'loading': Its reference list has been requested
+        'expanded': children are set
+        'collapsed': Not expanded on request
+        'seen': The wrapper has been expanded elsewhere in the tree
+        'limit': max_depth has been reached (can be expanded on request)
+    """
+    def __init__(self, wrapper, depth, parent=None):
+        self.wrapper = wrapper
+        self.depth = depth
+        self.parent = parent
+        self.children = []
+        self.state = 'loading'
+
+        """
+        Number of neighbours left out because of max_fanout
+        """
+        self.truncated = 0
+
+    def walk(self):
+        """
+        All nodes of the subtree in display order
+        """
+        yield self
+        for c in self.children:
+            yield from c.walk()
+
+
+def traverse(root, reference, direction, max_depth, max_fanout, order=TRAVERSE_BFS, level=None, toggled=()):
+    """
+    Build the tree of wrappers reachable from root through the reference lists given by reference and direction, with at
+    most max_depth levels below root and max_fanout children per node. Wrappers in toggled are collapsed, or expanded
+    if they are at max_depth.
+
+    Whatever is missing (reference lists up to level, which defaults to the second to last level, and symbols) is
+    requested in the given order at once, so it is loaded in parallel by the job queue. Call again once notified to
+    extend the tree. Returns (root TreeNode, True if nothing is missing).
+    """
+    complete = True
+    seen = set()
+    root_node = TreeNode(root, 0)
+    pending = deque([root_node])
+
+    while len(pending) > 0:
+        node = pending.popleft() if order == TRAVERSE_BFS else pending.pop()
+        wrapper = node.wrapper
+
+        if not wrapper.symbol.is_loaded():
+            wrapper.symbol.request()
+            complete = False
+
+        if wrapper in seen:
+            node.state = 'seen'
+            continue
+        seen.add(wrapper)
+
+        if node.depth < max_depth and wrapper in toggled:
+            node.state = 'collapsed'
+            continue
+
+        if node.depth >= max_depth and wrapper not in toggled:
+            node.state = 'limit'
+            continue
+
+        loadable = wrapper.source_of[reference.name] if direction == DIRECTION_SOURCE else wrapper.target_of[reference.name]
+        list_level = level
+        if list_level is None:
+            list_level = loadable.levels[-2] if len(loadable.levels) > 1 else loadable.levels[0]
+
+        if not loadable.is_loaded(list_level):
+            loadable.request(list_level)
+            complete = False
+            node.state = 'loading'
+            continue
+
+        neighbours = loadable.get()
+        node.state = 'expanded'
+        node.truncated = max(0, len(neighbours) - max_fanout)
+        node.children = [TreeNode(w, node.depth + 1, node) for w in neighbours[:max_fanout]]
+
+        """
+        For DFS, push in reverse so the first child is visited first
+        """
+        pending.extend(node.children if order == TRAVERSE_BFS else reversed(node.children))
+
+    return root_node, complete
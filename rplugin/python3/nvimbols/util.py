@@ -11,6 +11,8 @@ import traceback
 
 from importlib.machinery import SourceFileLoader
 
+from nvimbols.logger import LOGGER, LOG_INFO, LOG_ERROR
+
 
 def find_rplugins(rtp):
     """
@@ -43,16 +45,27 @@ def import_plugin(path, source, classname):
     return cls
 
 
+def _echom(vim, lines):
+    """
+    One threadsafe_call for all lines
+    """
+    command = " | ".join("echom \"[nvimbols] %s \"" % line.replace("\\", "\\\\").replace("\"", "\\\"") for line in lines)
+    vim.session.threadsafe_call(lambda: vim.command(command))
+
+
 def error(vim, expr):
     if vim is not None:
-        vim.session.threadsafe_call(lambda: vim.command("echom(\"[nvimbols] %s \")" % str(expr).replace("\"", "\\\"")))
-    log("[error] %s" % str(expr))
+        _echom(vim, [str(expr)])
+    log(str(expr), LOG_ERROR)
 
 
 def on_error(vim, err):
-    for line in traceback.format_exc().splitlines():
-        error(vim, str(line))
-    error(vim, '%s.  Use :messages for error details.' % str(err))
+    lines = "".join(traceback.format_exception(type(err), err, err.__traceback__)).splitlines()
+    lines += ['%s.  Use :messages for error details.' % str(err)]
+
+    if vim is not None:
+        _echom(vim, lines)
+    log("\n".join(lines), LOG_ERROR)
 
 
 def on_error_wrap(vim, func):
@@ -64,7 +77,8 @@ def on_error_wrap(vim, func):
     return wrapped
 
 
-def log(msg):
-    with open('/tmp/pylog', 'a') as f:
-        f.write(str(msg) + "\n")
-
+def log(msg, level=LOG_INFO):
+    """
+    Buffered, see Logger
+    """
+    LOGGER.log(msg, level)